@@ -0,0 +1,376 @@
+import hashlib
+import json
+import os
+import re
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from fuzzy_matcher import FuzzyMatcher, DEFAULT_THRESHOLD
+from compliance_rules import compile_rules, describe_problem, LimitKind
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("registry_reloads_total", "Reloads of the additive data file by result.")
+
+# FOOD_ADDITIVES_DATA points the agents at another data file, e.g. a staging copy
+DEFAULT_DATA_FILE = os.environ.get("FOOD_ADDITIVES_DATA", "/home/student_01_ab8595ac0887/hackathon_project/food_additives_data_v2.json")
+
+E_NUMBER_PATTERN = re.compile(r'e\d+')
+
+# Food product descriptions whose resolved category is remembered per registry
+RESOLVED_CATEGORIES_MAXSIZE = 4096
+
+def normalize_key(text):
+    """Lowercases a code or name and collapses whitespace so it can be used as an index key."""
+    return " ".join(str(text).lower().split())
+
+def additive_aliases(additive):
+    """Returns every name an additive is known by: its name, the parts of combined names and its synonyms."""
+    name = additive.get("name", "")
+    aliases = [name]
+    # Combined names such as "Azorubine / Carmoisine" list alternative names
+    if "/" in name:
+        aliases.extend(part.strip() for part in name.split("/"))
+    aliases.extend(additive.get("synonyms", []))
+    return [alias for alias in aliases if alias]
+
+def category_ancestors(category_id):
+    """Returns a category_id and its parents in the Annex II hierarchy, most specific first: 14.1.4, 14.1, 14."""
+    parts = category_id.split(".")
+    return [".".join(parts[:length]) for length in range(len(parts), 0, -1)]
+
+class AdditiveRegistry:
+    """
+    In-memory, indexed view of the food additives data file.
+
+    The file is parsed once and the following indices are built:
+    - code index: E-number -> additive
+    - alias index: normalized name or synonym -> additive
+    - compiled rules: per additive, category_id -> ComplianceRule records
+    - category name index: normalized category_name -> category_id
+    - category index: category_id -> rules of all additives, and category_id -> itself and its subcategories
+    - a trigram-pruned fuzzy matcher over all names and synonyms
+    """
+
+    def __init__(self, additives_data, source=None, version=None, generation=0):
+        self.source = source
+        self.version = version
+        # Orders registries of the same data file: newer loads have a higher generation
+        self.generation = generation
+        self.additives = additives_data
+        self.by_code = {}
+        self.by_alias = {}
+        self.rules_by_additive = []
+        self.rules_by_category = []
+        self.load_errors = []
+        self.category_ids_by_name = {}
+        self.rules_by_category_id = {}
+        self.subcategories = {}
+        self._build_indices()
+
+    @classmethod
+    def from_file(cls, json_file_path):
+        """
+        Parses and indexes a data file; the registry version is the SHA-256 of the file and
+        its generation the modification time of the file in nanoseconds.
+        """
+        with open(json_file_path, 'rb') as f:
+            generation = os.fstat(f.fileno()).st_mtime_ns
+            raw_data = f.read()
+        additives_data = json.loads(raw_data)
+        return cls(additives_data, source=json_file_path, version=hashlib.sha256(raw_data).hexdigest(),
+                   generation=generation)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_positions"]
+        del state["_resolve_cached"]
+        # Built on demand by preclassifier.get_preclassifier
+        state.pop("preclassifier", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._index_positions()
+
+    def _build_indices(self):
+        for additive in self.additives:
+            rules = compile_rules(additive)
+            self.rules_by_additive.append(rules)
+            self.load_errors.extend(describe_problem(rule) for rule in rules if rule.kind is LimitKind.INVALID)
+
+            code = normalize_key(additive.get("code", ""))
+            if code:
+                # Keep the first entry for duplicated codes, as the linear scan did
+                self.by_code.setdefault(code, additive)
+            for alias in additive_aliases(additive):
+                self.by_alias.setdefault(normalize_key(alias), additive)
+
+            rules_by_category = {}
+            for rule in rules:
+                rules_by_category.setdefault(rule.category_id, []).append(rule)
+                if rule.category_id is not None:
+                    self.category_ids_by_name.setdefault(normalize_key(rule.category_name), rule.category_id)
+                    self.rules_by_category_id.setdefault(rule.category_id, []).append(rule)
+            self.rules_by_category.append(rules_by_category)
+        for category_id in self.rules_by_category_id:
+            for ancestor in category_ancestors(category_id):
+                self.subcategories.setdefault(ancestor, []).append(category_id)
+        self._index_positions()
+        self.name_matcher = FuzzyMatcher(list(self.by_alias))
+        self.category_matcher = FuzzyMatcher(list(self.category_ids_by_name))
+
+    def _index_positions(self):
+        # Additive dicts are identified by object identity, which is not stable across
+        # serialization, so this index is rebuilt whenever the registry is loaded
+        self._positions = {id(additive): position for position, additive in enumerate(self.additives)}
+        # The memo of resolved food products is bounded and not serialized either
+        self._resolve_cached = lru_cache(maxsize=RESOLVED_CATEGORIES_MAXSIZE)(self._resolve_category)
+
+    def __len__(self):
+        return len(self.additives)
+
+    def get_by_code(self, code):
+        """Looks up an additive by its E-number, e.g. 'E211'."""
+        return self.by_code.get(normalize_key(code))
+
+    def get_by_alias(self, name):
+        """Looks up an additive by its exact (case-insensitive) name or synonym."""
+        return self.by_alias.get(normalize_key(name))
+
+    def rules_for(self, additive):
+        """Returns the compiled rules of an additive, in data file order."""
+        position = self._positions.get(id(additive))
+        return self.rules_by_additive[position] if position is not None else compile_rules(additive)
+
+    def rules_for_category(self, additive, category_id):
+        """
+        Returns the compiled rules of an additive that apply to the given category_id: its rules
+        for the category or, as in rules_in_category, for the most specific parent category.
+        """
+        position = self._positions.get(id(additive))
+        if position is None:
+            rules_by_category = {}
+            for rule in compile_rules(additive):
+                rules_by_category.setdefault(rule.category_id, []).append(rule)
+        else:
+            rules_by_category = self.rules_by_category[position]
+        for level in category_ancestors(category_id):
+            if level in rules_by_category:
+                return rules_by_category[level]
+        return []
+
+    def resolve_category(self, food_product, threshold=DEFAULT_THRESHOLD):
+        """
+        Resolves a food product description to a category_id across all additives.
+        The results for the most recently used products are memoized, so repeated products
+        are resolved once.
+        """
+        return self._resolve_cached(normalize_key(food_product), threshold)
+
+    def _resolve_category(self, product_key, threshold):
+        category_id = self.category_ids_by_name.get(product_key)
+        if category_id is None:
+            best_name, _ = self.category_matcher.match(product_key, threshold)
+            category_id = self.category_ids_by_name.get(best_name) if best_name else None
+        return category_id
+
+    def find_category(self, food_category, threshold=DEFAULT_THRESHOLD):
+        """Returns the category_id for a category_id such as '14.1' (also one without rules of its own) or a food product description."""
+        category_id = food_category.strip()
+        if category_id in self.subcategories:
+            return category_id
+        return self.resolve_category(food_category, threshold)
+
+    def rules_in_category(self, category_id, include_subcategories=False):
+        """
+        Returns the rules of all additives that apply to a food category.
+
+        Rules of parent categories apply to their subcategories, so 14.1.4 also gets the rules
+        listed for 14.1 and 14, unless the additive has rules at a more specific level. With
+        `include_subcategories`, the rules of every subcategory (e.g. 14.1.x for 14.1) are added.
+        """
+        rules = []
+        covered = set()
+        for level in category_ancestors(category_id):
+            level_rules = [rule for rule in self.rules_by_category_id.get(level, ()) if rule.code not in covered]
+            covered.update(rule.code for rule in level_rules)
+            rules.extend(level_rules)
+        if include_subcategories:
+            for subcategory_id in self.subcategories.get(category_id, ()):
+                if subcategory_id != category_id:
+                    rules.extend(self.rules_by_category_id[subcategory_id])
+        return rules
+
+    def find_additive(self, ingredient, threshold=DEFAULT_THRESHOLD):
+        """
+        Finds an additive by E-number or name.
+
+        E-numbers are looked up in the code index. Names are looked up in the alias
+        index first; if there is no exact hit, the best fuzzy match above `threshold` is used.
+        """
+        if E_NUMBER_PATTERN.match(ingredient.lower()):
+            return self.get_by_code(ingredient)
+
+        additive = self.get_by_alias(ingredient)
+        if additive:
+            return additive
+
+        best_alias, _ = self.name_matcher.match(ingredient, threshold)
+        return self.by_alias.get(best_alias) if best_alias else None
+
+def load_registry(json_file_path):
+    """
+    Loads the registry of a data file from its compiled snapshot when the snapshot is
+    up to date, and from the JSON file otherwise.
+    """
+    # Imported here because the snapshot module builds on this one
+    from registry_snapshot import load_snapshot, snapshot_path_for
+    registry = load_snapshot(snapshot_path_for(json_file_path), json_file_path)
+    return registry if registry is not None else AdditiveRegistry.from_file(json_file_path)
+
+class RegistryValidationError(ValueError):
+    """Raised when a data file does not hold a usable list of additives."""
+
+def validate_additives(additives_data):
+    """Checks the shape of a data file before it replaces the registry in use."""
+    if not isinstance(additives_data, list) or not additives_data:
+        raise RegistryValidationError("The data file must hold a non-empty list of additives.")
+    for position, additive in enumerate(additives_data):
+        if not isinstance(additive, dict):
+            raise RegistryValidationError(f"Entry {position} is not an object.")
+        if not additive.get("code"):
+            raise RegistryValidationError(f"Entry {position} has no code.")
+        if not isinstance(additive.get("food_categories", []), list):
+            raise RegistryValidationError(f"food_categories of {additive['code']} is not a list.")
+
+def file_signature(json_file_path):
+    """Returns (size, mtime_ns) of a file, which changes whenever the file is rewritten."""
+    stat = os.stat(json_file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+class RegistryHolder:
+    """
+    Holds the registry in use for one data file and replaces it when the file changes.
+
+    A new registry is built and validated next to the current one and then swapped in with
+    a single reference assignment. Callers that took a registry keep using it until they
+    are done, so in-flight requests finish on the data they started with.
+    """
+
+    def __init__(self, json_file_path):
+        self.json_file_path = json_file_path
+        self.current = None
+        self.signature = None
+        self.loaded_at = None
+        self.last_error = None
+        # Set while a registry is in use, whether it came from the first load, a reload or the watcher
+        self.ready = threading.Event()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def get(self):
+        """Returns the registry in use, loading it on first use."""
+        registry = self.current
+        if registry is None:
+            with self._reload_lock:
+                if self.current is None:
+                    self._load()
+            registry = self.current
+        return registry
+
+    def _load(self):
+        signature = file_signature(self.json_file_path)
+        registry = load_registry(self.json_file_path)
+        validate_additives(registry.additives)
+        for problem in registry.load_errors:
+            logger.warning("Invalid rule in %s: %s", self.json_file_path, problem)
+        previous = self.swap(registry)
+        self.signature = signature
+        return previous
+
+    def swap(self, registry):
+        """Makes `registry` the one in use and returns the previous one."""
+        previous, self.current = self.current, registry
+        self.loaded_at = time.time()
+        if registry is not None:
+            self.ready.set()
+        else:
+            self.ready.clear()
+        return previous
+
+    def reload(self, force=False):
+        """
+        Rebuilds the registry when the data file changed since it was loaded, or always with `force`.
+        Returns a status dict; on failure the current registry stays in use and {"error": ...} is returned.
+        """
+        with self._reload_lock:
+            try:
+                if not force and self.current is not None and file_signature(self.json_file_path) == self.signature:
+                    return {"status": "unchanged", "data_version": self.current.version}
+                previous = self._load()
+            except (OSError, ValueError, AttributeError, TypeError) as e:
+                self.last_error = str(e)
+                metrics.inc("registry_reloads_total", result="failed")
+                logger.error("Keeping the current additive data, reloading %s failed: %s", self.json_file_path, e)
+                return {"error": f"Reloading {self.json_file_path} failed: {e}"}
+            self.last_error = None
+            previous_version = previous.version if previous is not None else None
+            changed = previous_version != self.current.version
+            metrics.inc("registry_reloads_total", result="reloaded" if changed else "unchanged")
+            if changed:
+                logger.info("Additive data %s reloaded: version %s, %d additives.", self.json_file_path, self.current.version, len(self.current))
+            return {
+                "status": "reloaded" if changed else "unchanged",
+                "data_version": self.current.version,
+                "previous_version": previous_version,
+                "additives": len(self.current)
+            }
+
+    def watch(self, interval=5.0):
+        """Starts a background thread that reloads the registry whenever the data file changes."""
+        if self._watcher is not None:
+            return
+        seen = self.signature
+        if seen is None and self.current is not None:
+            # The registry was swapped in directly, so only later changes of the file count
+            try:
+                seen = file_signature(self.json_file_path)
+            except OSError:
+                pass
+
+        def run():
+            nonlocal seen
+            while not self._stop_watching.wait(interval):
+                try:
+                    signature = file_signature(self.json_file_path)
+                except OSError:
+                    # The file is being replaced; look again on the next tick
+                    continue
+                if signature != seen:
+                    seen = signature
+                    self.reload()
+        self._watcher = threading.Thread(target=run, name="registry-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop_watching.set()
+
+_holders = {}
+_holders_lock = threading.Lock()
+
+def get_registry_holder(json_file_path=DEFAULT_DATA_FILE):
+    """Returns the shared RegistryHolder of a data file."""
+    holder = _holders.get(json_file_path)
+    if holder is None:
+        with _holders_lock:
+            holder = _holders.setdefault(json_file_path, RegistryHolder(json_file_path))
+    return holder
+
+def get_registry(json_file_path=DEFAULT_DATA_FILE):
+    """Returns the registry in use for a data file, loading and indexing it on first use."""
+    return get_registry_holder(json_file_path).get()
@@ -0,0 +1,196 @@
+"""
+Bulk label-compliance runner.
+
+Reads product records from a JSONL or CSV file (or stdin) and streams one JSONL result
+per record. Records are evaluated in parallel worker processes while only a bounded
+window of records is in flight, so memory stays constant regardless of input size.
+Results are written in input order and the number of written records is checkpointed,
+so an interrupted run can be resumed with --resume.
+
+Each input record holds either a label:
+    {"id": "SKU-1", "text_block": "ORANGE BLAST ..."}
+or an already structured product:
+    {"id": "SKU-2", "food_category": "Beverages", "ingredients": [{"name": "E211", "concentration": "150 mg/L"}]}
+CSV input uses the same column names, with `ingredients` holding a JSON list.
+
+Usage: python3 batch_runner.py <input|-> <output.jsonl> [--workers N] [--resume]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from pipeline import create_pipeline
+
+_pipeline = None
+
+def _init_worker():
+    global _pipeline
+    _pipeline = create_pipeline()
+
+def evaluate_record(record):
+    """Evaluates one input record with the worker's pipeline; errors are captured in the result."""
+    global _pipeline
+    if _pipeline is None:
+        _init_worker()
+    try:
+        if record.get("text_block"):
+            return _pipeline.run(record["text_block"])
+        ingredients = record.get("ingredients", [])
+        if isinstance(ingredients, str):
+            ingredients = json.loads(ingredients)
+        return _pipeline.evaluate_product(record.get("food_category", "Unknown"), ingredients)
+    except Exception as e:
+        return {"error": str(e)}
+
+def read_records(input_file, input_format):
+    """Yields input records one at a time from a JSONL or CSV stream."""
+    if input_format == "csv":
+        yield from csv.DictReader(input_file)
+        return
+    for line in input_file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"_invalid": f"Invalid JSON record: {e}"}
+
+class Checkpoint:
+    """
+    Remembers how many records have been written to the output and the output size at that point.
+    The output file is truncated back to that size on resume, so a crash never leaves
+    partial or duplicated result lines.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"offset": 0, "output_size": 0}
+
+    def reset(self):
+        """Forgets the checkpoint of an earlier run, so a later --resume cannot pick it up."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def save(self, offset, output_size):
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump({"offset": offset, "output_size": output_size}, f)
+        os.replace(temporary_path, self.path)
+
+class Summary:
+    """Collects throughput, per-status and error counts for the end-of-run summary."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.records = 0
+        self.record_errors = 0
+        self.ingredient_errors = 0
+        self.status_counts = Counter()
+
+    def add(self, result):
+        self.records += 1
+        if "error" in result:
+            self.record_errors += 1
+            return
+        for ingredient_result in result.get("results", []):
+            if "error" in ingredient_result:
+                self.ingredient_errors += 1
+            else:
+                self.status_counts[ingredient_result.get("status")] += 1
+
+    def as_dict(self, skipped=0):
+        elapsed = time.monotonic() - self.started
+        return {
+            "records": self.records,
+            "skipped_from_checkpoint": skipped,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(self.records / elapsed, 2) if elapsed else None,
+            "status_counts": dict(self.status_counts),
+            "record_errors": self.record_errors,
+            "ingredient_errors": self.ingredient_errors
+        }
+
+def run_batch(input_file, output_path, input_format="jsonl", workers=None, resume=False, window=None):
+    """Evaluates every record of `input_file`, appending results to `output_path`, and returns the summary."""
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+    checkpoint = Checkpoint(f"{output_path}.checkpoint")
+    if resume:
+        state = checkpoint.load()
+    else:
+        checkpoint.reset()
+        state = {"offset": 0, "output_size": 0}
+
+    output = open(output_path, 'a' if resume else 'w')
+    output.truncate(state["output_size"])
+    output.seek(state["output_size"])
+
+    summary = Summary()
+    offset = state["offset"]
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    in_flight = deque()
+
+    def commit(record_offset, record, result):
+        nonlocal offset
+        summary.add(result)
+        output.write(json.dumps({"id": record.get("id", record_offset), "offset": record_offset, "result": result}) + "\n")
+        output.flush()
+        offset = record_offset + 1
+        checkpoint.save(offset, output.tell())
+
+    try:
+        for record_offset, record in enumerate(read_records(input_file, input_format)):
+            if record_offset < state["offset"]:
+                continue
+            if "_invalid" in record:
+                in_flight.append((record_offset, {}, None, {"error": record["_invalid"]}))
+            elif executor is None:
+                in_flight.append((record_offset, record, None, evaluate_record(record)))
+            else:
+                in_flight.append((record_offset, record, executor.submit(evaluate_record, record), None))
+
+            # Write finished records in input order, and block once the window is full
+            while in_flight and (len(in_flight) >= window or in_flight[0][2] is None or in_flight[0][2].done()):
+                head_offset, head_record, future, result = in_flight.popleft()
+                commit(head_offset, head_record, future.result() if future else result)
+
+        while in_flight:
+            head_offset, head_record, future, result = in_flight.popleft()
+            commit(head_offset, head_record, future.result() if future else result)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        output.close()
+
+    return summary.as_dict(skipped=state["offset"])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluate product labels in bulk, streaming JSONL results.")
+    parser.add_argument("input", help="JSONL or CSV input file, or - for stdin")
+    parser.add_argument("output", help="JSONL output file")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from the file extension, JSONL for stdin)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--resume", action="store_true", help="Continue after the last checkpointed record of a previous run")
+    args = parser.parse_args()
+
+    input_format = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    if args.input == "-":
+        summary = run_batch(sys.stdin, args.output, input_format, args.workers, args.resume)
+    else:
+        with open(args.input, 'r', newline='') as input_file:
+            summary = run_batch(input_file, args.output, input_format, args.workers, args.resume)
+    print(json.dumps(summary, indent=2), file=sys.stderr)
@@ -0,0 +1,68 @@
+"""
+Counts model calls under concurrent label traffic with the AsyncLLMClient against the fake
+model server, with micro-batching and with one input per call.
+
+Labels are evaluated by concurrent clients through one shared pipeline, as in the web server.
+The fast path is disabled, so every ingredient goes through the LLM helper. For each mode it
+reports the LLM helper calls made by the pipeline (what a blocking client would send as model
+requests), the model calls actually sent, the unique inputs and the elapsed time.
+
+Usage: python3 benchmarks/llm_batching.py [--labels 200] [--clients 32] [--latency 0.05]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENTS_DIR)
+
+from benchmarks.synthetic_data import generate_rules, generate_labels
+from llm_cache import LLMCache
+from llm_client import AsyncLLMClient, HTTPModelBackend, FakeModelServer
+from pipeline import create_pipeline
+
+# Ingredients processed at the same time across all labels, as INGREDIENT_WORKERS in the web server
+INGREDIENT_WORKERS = 64
+
+def run(labels, clients, server, max_batch_size):
+    client = AsyncLLMClient(HTTPModelBackend(server.url), max_batch_size=max_batch_size)
+    pipeline = create_pipeline(max_workers=INGREDIENT_WORKERS, llm_cache=LLMCache(), fast_path=False, llm_client=client)
+    calls_before = server.calls
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(clients) as executor:
+            list(executor.map(pipeline.run, labels))
+    finally:
+        pipeline.close()
+        client.close()
+    stats = client.stats()
+    return {
+        "max_batch_size": max_batch_size,
+        "llm_helper_calls": stats["requests"],
+        "coalesced": stats["coalesced"],
+        "model_calls": server.calls - calls_before,
+        "average_batch_size": round(stats["average_batch_size"], 2),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+
+def main(label_count=200, clients=32, latency=0.05):
+    additives = generate_rules(1000, seed=1)
+    labels = generate_labels(additives, label_count, seed=1)
+    ingredients = [ingredient.strip() for label in labels for ingredient in label.split(",")]
+    report = {"labels": label_count, "ingredients": len(ingredients), "unique_ingredients": len(set(ingredients)),
+              "clients": clients, "model_latency_seconds": latency, "results": []}
+    with FakeModelServer(latency=latency) as server:
+        for max_batch_size in (32, 1):
+            report["results"].append(run(labels, clients, server, max_batch_size))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Count model calls of the AsyncLLMClient under concurrent label traffic.")
+    parser.add_argument("--labels", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="Labels evaluated at the same time")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per model call of the fake model server")
+    args = parser.parse_args()
+    main(args.labels, args.clients, args.latency)
@@ -0,0 +1,174 @@
+"""
+Measures memory and throughput of the compliance server under gunicorn at several worker counts,
+with the registry preloaded and shared by the workers and without (every worker loads its own).
+
+For each worker count it starts gunicorn with FoodComplianceUI/gunicorn.conf.py on a synthetic
+data file and waits until every worker is ready. It then warms the workers up, as the first
+requests build per-process state such as the pre-classifier when the registry is not preloaded,
+posts labels to /analyze from concurrent clients for a fixed time and reads, per worker, the
+resident set size (RSS) and the proportional set size (PSS, which divides shared pages between
+the processes sharing them) from /proc.
+
+Usage: python3 benchmarks/multiworker.py [--workers 1 4 16] [--rules 100000] [--seconds 20] [--warmup 10] [--clients 16]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UI_DIR = os.path.join(os.path.dirname(AGENTS_DIR), "FoodComplianceUI")
+RESULTS_DIR = os.path.join(AGENTS_DIR, "benchmarks", "results")
+sys.path.insert(0, AGENTS_DIR)
+
+from benchmarks.synthetic_data import generate_rules, generate_labels
+from benchmarks.suite import percentile, current_commit
+
+PORT = 8097
+
+def memory_kb(pid):
+    """Returns (rss_kb, pss_kb) of a process."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0]] = int(parts[1])
+    return values.get("Rss:"), values.get("Pss:")
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+def request(method, path, body=None, timeout=60):
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=timeout)
+    try:
+        connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+def wait_until_ready(workers, timeout=600):
+    """Polls /healthz until `workers` different worker processes have answered ready."""
+    ready = set()
+    deadline = time.monotonic() + timeout
+    while len(ready) < workers and time.monotonic() < deadline:
+        try:
+            status, body = request("GET", "/healthz", timeout=5)
+            if status == 200:
+                ready.add(json.loads(body)["pid"])
+                continue
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return len(ready) >= workers
+
+def load(labels, clients, seconds):
+    """Posts labels from `clients` threads for `seconds`; returns throughput and latency percentiles."""
+    samples = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client(offset):
+        position = offset
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                status, _ = request("POST", "/analyze", {"text_block": labels[position % len(labels)]})
+            except OSError as e:
+                status = str(e)
+            elapsed = time.perf_counter() - start
+            with lock:
+                (samples if status == 200 else errors).append(elapsed)
+            position += clients
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "throughput_per_second": round(len(samples) / elapsed, 2),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2) if samples else None,
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 2) if samples else None
+    }
+
+def run(workers, preload, data_file, cache_file, labels, clients, seconds, warmup):
+    env = dict(os.environ, FOOD_ADDITIVES_DATA=data_file, WEB_CONCURRENCY=str(workers),
+               BIND=f"127.0.0.1:{PORT}", PRELOAD_REGISTRY="1" if preload else "0", SHARED_CACHE_FILE=cache_file)
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+                               cwd=UI_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        started = time.monotonic()
+        if not wait_until_ready(workers):
+            return {"error": "the workers did not become ready"}
+        startup_seconds = time.monotonic() - started
+        load(labels, clients, warmup)
+        throughput = load(labels, clients, seconds)
+        master_rss, master_pss = memory_kb(process.pid)
+        memory = [memory_kb(pid) for pid in worker_pids(process.pid)]
+        return dict(throughput, **{
+            "startup_seconds": round(startup_seconds, 2),
+            "master_rss_mb": round(master_rss / 1024, 1),
+            "worker_rss_mb": round(sum(rss for rss, _ in memory) / len(memory) / 1024, 1),
+            "worker_pss_mb": round(sum(pss for _, pss in memory) / len(memory) / 1024, 1),
+            "total_pss_mb": round((master_pss + sum(pss for _, pss in memory)) / 1024, 1)
+        })
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+def main(worker_counts, rule_count, seconds, warmup, clients, output=None):
+    additives = generate_rules(rule_count, seed=rule_count)
+    labels = generate_labels(additives, 500, seed=rule_count)
+    report = {"commit": current_commit(), "rules": rule_count, "cpus": os.cpu_count(),
+              "seconds": seconds, "warmup_seconds": warmup, "clients": clients, "results": []}
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "food_additives_data.json")
+        with open(data_file, 'w') as f:
+            json.dump(additives, f)
+        for workers in worker_counts:
+            for preload in (True, False):
+                print(f"Running {workers} workers, {'preloaded' if preload else 'not preloaded'}...", file=sys.stderr)
+                cache_file = os.path.join(directory, f"cache-{workers}-{preload}.sqlite")
+                result = run(workers, preload, data_file, cache_file, labels, clients, seconds, warmup)
+                report["results"].append(dict(result, workers=workers, preload=preload))
+
+    output = output or os.path.join(RESULTS_DIR, f"multiworker-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'workers':>7} {'preload':>7} {'worker RSS MB':>13} {'worker PSS MB':>13} {'total PSS MB':>12} {'req/s':>8} {'p95 ms':>8}")
+    for result in report["results"]:
+        if "error" in result:
+            print(f"{result['workers']:>7} {str(result['preload']):>7} {result['error']}")
+            continue
+        print(f"{result['workers']:>7} {str(result['preload']):>7} {result['worker_rss_mb']:>13} {result['worker_pss_mb']:>13} "
+              f"{result['total_pss_mb']:>12} {result['throughput_per_second']:>8} {str(result['p95_ms']):>8}")
+    print(f"Results written to {output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the compliance server's memory and throughput under gunicorn.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Worker counts")
+    parser.add_argument("--rules", type=int, default=100000, help="Food category rules in the synthetic data file")
+    parser.add_argument("--seconds", type=float, default=20, help="Load duration per run")
+    parser.add_argument("--warmup", type=float, default=10, help="Load before measuring, per run")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/multiworker-<commit>.json)")
+    args = parser.parse_args()
+    main(args.workers, args.rules, args.seconds, args.warmup, args.clients, args.output)
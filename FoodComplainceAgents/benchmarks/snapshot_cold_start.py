@@ -0,0 +1,60 @@
+"""
+Compares cold-start time and memory of loading the additive registry from JSON and from
+a compiled snapshot, on a synthetic data set the size of the full EU Annex II.
+
+Each load runs in a fresh interpreter so that import and allocation costs are included.
+
+Usage: python3 benchmarks/snapshot_cold_start.py [additive_count]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENTS_DIR)
+
+from benchmarks.synthetic_data import generate_additives
+from registry_snapshot import build_snapshot
+
+LOAD_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {agents_dir!r})
+start = time.perf_counter()
+from additive_registry import AdditiveRegistry, load_registry
+registry = AdditiveRegistry.from_file({data_file!r}) if {use_json} else load_registry({data_file!r})
+registry.find_additive("E1000")
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+def measure(data_file, use_json, runs=3):
+    samples = []
+    for _ in range(runs):
+        script = LOAD_SCRIPT.format(agents_dir=AGENTS_DIR, data_file=data_file, use_json=use_json)
+        # The snapshot is built by this process, so the child may load it unsigned
+        env = dict(os.environ, TRUST_UNSIGNED_SNAPSHOTS="1")
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env).stdout
+        samples.append(json.loads(output))
+    return min(sample["seconds"] for sample in samples), min(sample["max_rss_kb"] for sample in samples)
+
+def main(additive_count=10000):
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "food_additives_data.json")
+        with open(data_file, 'w') as f:
+            json.dump(generate_additives(additive_count), f, indent=2)
+        snapshot_file = build_snapshot(data_file)
+
+        json_seconds, json_rss = measure(data_file, use_json=True)
+        snapshot_seconds, snapshot_rss = measure(data_file, use_json=False)
+
+        print(f"additives:           {additive_count}")
+        print(f"JSON file size:      {os.path.getsize(data_file) / 1024:.0f} KiB")
+        print(f"snapshot file size:  {os.path.getsize(snapshot_file) / 1024:.0f} KiB")
+        print(f"JSON load + index:   {json_seconds * 1000:.1f} ms, max RSS {json_rss / 1024:.1f} MiB")
+        print(f"snapshot load:       {snapshot_seconds * 1000:.1f} ms, max RSS {snapshot_rss / 1024:.1f} MiB")
+        print(f"speed-up:            {json_seconds / snapshot_seconds:.1f}x")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
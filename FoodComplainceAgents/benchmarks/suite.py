@@ -0,0 +1,207 @@
+"""
+Latency and throughput benchmarks for the compliance agents on synthetic data.
+
+For each data set size (in food category rules) it generates an additive data file and
+ingredient labels, then times:
+- evaluate_compliance   one additive x food category evaluation
+- find_best_match       fuzzy lookup of a mangled additive name among all names
+- judge_evaluation      review of an evaluator result
+- headroom_sweep        one additive x food category at 1000 concentrations
+- permitted_additives   all additives permitted in a food category, with inherited rules
+- parse_label           label text to food category and ingredients, without the LLM helper
+- main                  main.main() on a label, output discarded
+- analyze               POST /analyze on the Flask app, through its test client
+
+Every benchmark reports p50/p95/p99 latency and throughput. Results are written as JSON to
+benchmarks/results/<commit>.json, and --compare prints the change against an earlier file.
+
+Usage: python3 benchmarks/suite.py [--rules 1000 10000 100000] [--iterations N] [--output FILE] [--compare FILE]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UI_DIR = os.path.join(os.path.dirname(AGENTS_DIR), "FoodComplianceUI")
+RESULTS_DIR = os.path.join(AGENTS_DIR, "benchmarks", "results")
+sys.path.insert(0, AGENTS_DIR)
+
+from additive_registry import AdditiveRegistry, get_registry_holder
+from benchmarks.synthetic_data import generate_rules, generate_labels
+from evaluator_agent import evaluate_compliance, find_best_match
+from judge_agent import judge_evaluation
+from headroom import sweep
+from permitted_additives import permitted_additives
+from label_parser import parse_label
+
+DEFAULT_RULE_COUNTS = (1000, 10000, 100000)
+CONCENTRATIONS = ["5 mg/kg", "50 mg/kg", "120 mg/L", "0.2 g/kg", "1500 mg/kg"]
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of already sorted samples."""
+    rank = max(int(round(fraction * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+def measure(operation, inputs, warmup=3):
+    """Calls `operation` once per input and returns latency percentiles (ms) and throughput."""
+    for value in inputs[:warmup]:
+        operation(value)
+    samples = []
+    started = time.perf_counter()
+    for value in inputs:
+        start = time.perf_counter()
+        operation(value)
+        samples.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+        "max_ms": round(samples[-1] * 1000, 4),
+        "throughput_per_second": round(len(samples) / elapsed, 2) if elapsed else None
+    }
+
+def mangle(name, rng):
+    """Writes an additive name the way it may appear on a label."""
+    kind = rng.random()
+    if kind < 0.4:
+        return name.upper()
+    if kind < 0.8:
+        position = rng.randrange(len(name))
+        return name[:position] + name[position + 1:]
+    return f"{name} (preservative)"
+
+@contextlib.contextmanager
+def default_registry(registry):
+    """Makes `registry` the one returned by get_registry() for the default data file."""
+    holder = get_registry_holder()
+    previous = holder.swap(registry)
+    try:
+        yield
+    finally:
+        holder.swap(previous)
+
+def run_scale(rule_count, iterations, pipeline_iterations, rng):
+    """Runs every benchmark on a synthetic data set of `rule_count` rules."""
+    additives = generate_rules(rule_count, seed=rule_count)
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "food_additives_data.json")
+        with open(data_file, 'w') as f:
+            json.dump(additives, f)
+        start = time.perf_counter()
+        registry = AdditiveRegistry.from_file(data_file)
+        load_seconds = time.perf_counter() - start
+
+    rules = [(additive["code"], category["category_name"]) for additive in additives for category in additive["food_categories"]]
+    names = [additive["name"] for additive in additives]
+    evaluations = [(code, rng.choice(CONCENTRATIONS), category) for code, category in rng.choices(rules, k=iterations)]
+    queries = [mangle(name, rng) for name in rng.choices(names, k=iterations)]
+    evaluation_outputs = [json.dumps(evaluate_compliance(*evaluation, registry=registry)) for evaluation in evaluations]
+    labels = generate_labels(additives, pipeline_iterations, seed=rule_count)
+
+    results = {
+        "additives": len(additives),
+        "registry_load_seconds": round(load_seconds, 3),
+        "evaluate_compliance": measure(lambda args: evaluate_compliance(*args, registry=registry), evaluations),
+        "find_best_match": measure(lambda query: find_best_match(query, names), queries),
+        "judge_evaluation": measure(judge_evaluation, evaluation_outputs),
+        "headroom_sweep": measure(lambda args: sweep(args[0], args[2], unit="mg/kg", start=0, stop=2000, num=1000, registry=registry),
+                                  evaluations[:max(iterations // 10, 1)]),
+        "permitted_additives": measure(lambda args: permitted_additives(args[2], registry=registry), evaluations),
+        "parse_label": measure(parse_label, generate_labels(additives, iterations, seed=rule_count + 1))
+    }
+
+    with default_registry(registry):
+        results["main"] = measure_main(labels)
+        results["analyze"] = measure_analyze(labels)
+    return results
+
+def measure_main(labels):
+    import main
+    def run(label):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.main(label)
+    return measure(run, labels)
+
+def measure_analyze(labels):
+    if not os.path.isdir(UI_DIR):
+        return {"skipped": "FoodComplianceUI not found"}
+    try:
+        sys.path.insert(0, UI_DIR)
+        import server
+    except ImportError as e:
+        return {"skipped": f"server dependencies missing: {e}"}
+    server.registry_ready.wait()
+    client = server.app.test_client()
+    def post(label):
+        response = client.post('/analyze', json={"text_block": label})
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyze returned {response.status_code}: {response.get_data(as_text=True)}")
+    return measure(post, labels)
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=AGENTS_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(current, baseline):
+    """Prints the p50/p95 change of every benchmark present in both result files."""
+    print(f"{'rules':>8} {'benchmark':<20} {'p50 ms':>18} {'p95 ms':>18}")
+    for rule_count, scale in current["results"].items():
+        baseline_scale = baseline["results"].get(rule_count, {})
+        for name, stats in scale.items():
+            before = baseline_scale.get(name)
+            if not isinstance(stats, dict) or not isinstance(before, dict) or "p50_ms" not in stats or "p50_ms" not in before:
+                continue
+            columns = []
+            for key in ("p50_ms", "p95_ms"):
+                change = (stats[key] / before[key] - 1) * 100 if before[key] else 0.0
+                columns.append(f"{before[key]:.3f}->{stats[key]:.3f} {change:+.0f}%")
+            print(f"{rule_count:>8} {name:<20} {columns[0]:>18} {columns[1]:>18}")
+
+def main(rule_counts=DEFAULT_RULE_COUNTS, iterations=500, pipeline_iterations=50, output=None, baseline_file=None):
+    rng = random.Random(0)
+    report = {
+        "commit": current_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": {}
+    }
+    for rule_count in rule_counts:
+        print(f"Running benchmarks on {rule_count} rules...", file=sys.stderr)
+        report["results"][str(rule_count)] = run_scale(rule_count, iterations, pipeline_iterations, rng)
+
+    output = output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if baseline_file:
+        with open(baseline_file, 'r') as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the compliance agents on synthetic data sets.")
+    parser.add_argument("--rules", type=int, nargs="+", default=list(DEFAULT_RULE_COUNTS), help="Data set sizes in food category rules")
+    parser.add_argument("--iterations", type=int, default=500, help="Calls per micro benchmark")
+    parser.add_argument("--pipeline-iterations", type=int, default=50, help="Labels per main/analyze benchmark")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier result file to compare against")
+    args = parser.parse_args()
+    main(args.rules, args.iterations, args.pipeline_iterations, args.output, args.compare)
@@ -0,0 +1,86 @@
+import random
+
+CATIONS = ["Sodium", "Potassium", "Calcium", "Magnesium", "Ammonium", "Iron", "Zinc", "Copper"]
+SYLLABLES = ["ta", "ro", "zi", "ne", "ben", "sor", "ci", "tri", "mal", "lac", "glu", "phos",
+             "ca", "ra", "mel", "xan", "thi", "ox", "pro", "pi", "on", "ate", "ine", "ol"]
+FUNCTIONS = ["Colour", "Preservative", "Emulsifier", "Acidity regulator", "Antioxidant", "Sweetener", "Thickener"]
+CATEGORIES = [
+    ("14.1.4", "Flavoured drinks"),
+    ("14.1.2", "Fruit juices"),
+    ("4.2.2", "Dried fruits"),
+    ("4.2.5.2", "Jams"),
+    ("5.1", "Chocolate"),
+    ("1.4", "Flavoured fermented milk products"),
+    ("7.2", "Fine bakery wares"),
+    ("8.3.1", "Non-heat-treated meat products"),
+    ("9.2", "Processed fish"),
+    ("12.6", "Sauces"),
+]
+
+def synthetic_name(rng):
+    """Builds a plausible additive name from random syllables, optionally with a cation."""
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+    if rng.random() < 0.5:
+        return f"{rng.choice(CATIONS)} {word.lower()}"
+    return word
+
+def generate_additives(count, seed=0):
+    """Generates `count` additives shaped like the entries of food_additives_data_v2.json."""
+    rng = random.Random(seed)
+    additives = []
+    for position in range(count):
+        categories = []
+        for category_id, category_name in rng.sample(CATEGORIES, rng.randint(1, 3)):
+            unit = "mg/L" if category_id.startswith("14.") else "mg/kg"
+            max_level = "Quantum satis" if rng.random() < 0.1 else f"{rng.choice([10, 20, 50, 100, 150, 300, 1000, 2000])} {unit}"
+            categories.append({
+                "category_id": category_id,
+                "category_name": category_name,
+                "max_level": max_level,
+                "function": rng.choice(FUNCTIONS)
+            })
+        additives.append({
+            "code": f"E{1000 + position}",
+            "name": synthetic_name(rng),
+            "food_categories": categories,
+            "regulation": "Regulation (EC) No 1333/2008 Annex II"
+        })
+    return additives
+
+def generate_rules(rule_count, seed=0):
+    """Generates additives until they hold exactly `rule_count` food category rules."""
+    additives = []
+    total = 0
+    chunk = max(rule_count // 2, 1)
+    while total < rule_count:
+        for additive in generate_additives(chunk, seed=seed + len(additives)):
+            additive["code"] = f"E{1000 + len(additives)}"
+            additive["food_categories"] = additive["food_categories"][:rule_count - total]
+            additives.append(additive)
+            total += len(additive["food_categories"])
+            if total == rule_count:
+                break
+    return additives
+
+BASE_INGREDIENTS = ["Water", "Sugar", "Glucose Syrup", "Natural Lemon Flavourings", "Orange Juice from Concentrate", "Salt"]
+
+def generate_labels(additives, count, seed=0):
+    """
+    Generates comma separated ingredient lists modeled on the ORANGE BLAST and LEMON ZING
+    test labels: a few base ingredients followed by additives written as "Name (E-number)",
+    "Colour: Name" or a bare E-number.
+    """
+    rng = random.Random(seed)
+    labels = []
+    for _ in range(count):
+        ingredients = rng.sample(BASE_INGREDIENTS, rng.randint(2, 4))
+        for additive in rng.sample(additives, min(len(additives), rng.randint(2, 5))):
+            style = rng.random()
+            if style < 0.5:
+                ingredients.append(f"{additive['name']} ({additive['code']})")
+            elif style < 0.8:
+                ingredients.append(f"Colour: {additive['name']}")
+            else:
+                ingredients.append(additive["code"])
+        labels.append(", ".join(ingredients))
+    return labels
@@ -0,0 +1,107 @@
+import json
+import re
+import sys
+from enum import Enum
+from typing import NamedTuple, Optional
+
+MAX_LEVEL_PATTERN = re.compile(r'(\d+\.?\d*)\s*(.*)')
+
+class LimitKind(Enum):
+    NUMERIC = "numeric"
+    QUANTUM_SATIS = "quantum_satis"
+    NOT_PERMITTED = "not_permitted"
+    NON_NUMERIC = "non_numeric"
+    INVALID = "invalid"
+
+class ComplianceRule(NamedTuple):
+    """
+    One additive x food category entry of the data file, compiled at load time.
+    `limit` is the maximum level in canonical mg/kg or mg/L for numeric rules.
+    Rules are plain tuples so that thousands of them stay compact and load quickly from snapshots.
+    """
+    code: str
+    name: str
+    category_id: Optional[str]
+    category_name: str
+    max_level: str
+    kind: LimitKind
+    limit: Optional[float] = None
+    unit: Optional[str] = None
+    function: Optional[str] = None
+    regulation: str = "N/A"
+    problem: Optional[str] = None
+
+def convert_to_mg_per_kg_or_l(value, unit):
+    """Converts a value to mg/kg or mg/L based on its unit."""
+    unit = unit.lower().strip()
+    if unit in ["mg/kg", "mg/l"]:
+        return value
+    if unit in ["g/kg", "g/l"]:
+        return value * 1000
+    if unit in ["kg/kg", "l/l"]:
+        return value * 1000000
+    if unit == "%":
+        # Weight per weight (or per volume for liquids): 1% is 10 g per kg or L
+        return value * 10000
+    if unit == "ppm":
+        return value
+    return None  # Unit not recognized
+
+def canonical_unit(unit):
+    """Returns 'mg/L' for volume based units and 'mg/kg' otherwise."""
+    return "mg/L" if unit.lower().strip().endswith("/l") else "mg/kg"
+
+def intern_optional(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def compile_rule(additive, category):
+    """Compiles the max_level of one food category of an additive into a ComplianceRule."""
+    max_level_str = category.get('max_level', '').strip()
+    # Category, function and regulation strings repeat across thousands of rules, so they are
+    # interned to share one copy in memory and in registry snapshots
+    fields = {
+        "code": additive.get("code", ""),
+        "name": additive.get("name", ""),
+        "category_id": intern_optional(category.get("category_id")),
+        "category_name": sys.intern(category.get("category_name", "")),
+        "max_level": sys.intern(max_level_str),
+        "function": intern_optional(category.get("function", additive.get("function"))),
+        "regulation": sys.intern(additive.get("regulation", "N/A"))
+    }
+
+    if max_level_str.lower() == 'quantum satis':
+        return ComplianceRule(kind=LimitKind.QUANTUM_SATIS, **fields)
+    if max_level_str.lower() == 'not permitted':
+        return ComplianceRule(kind=LimitKind.NOT_PERMITTED, **fields)
+
+    max_level_match = MAX_LEVEL_PATTERN.search(max_level_str)
+    if not max_level_match:
+        return ComplianceRule(kind=LimitKind.NON_NUMERIC, **fields)
+
+    max_level_value = float(max_level_match.group(1))
+    max_level_unit = max_level_match.group(2).strip()
+    limit = convert_to_mg_per_kg_or_l(max_level_value, max_level_unit)
+    if limit is None:
+        return ComplianceRule(kind=LimitKind.INVALID, problem=f"Unrecognized unit in max level: {max_level_unit}", **fields)
+    return ComplianceRule(kind=LimitKind.NUMERIC, limit=limit, unit=canonical_unit(max_level_unit), **fields)
+
+def compile_rules(additive):
+    """Compiles all food categories of an additive, in data file order."""
+    return [compile_rule(additive, category) for category in additive.get("food_categories", [])]
+
+def describe_problem(rule):
+    return f"{rule.code} ({rule.name}), category {rule.category_id} '{rule.category_name}': {rule.problem}"
+
+if __name__ == '__main__':
+    # Validates a data file and lists the rules that could not be compiled
+    if len(sys.argv) != 2:
+        print("Usage: python compliance_rules.py <food_additives_data.json>")
+    else:
+        with open(sys.argv[1], 'r') as f:
+            additives_data = json.load(f)
+        rules = [rule for additive in additives_data for rule in compile_rules(additive)]
+        problems = [describe_problem(rule) for rule in rules if rule.kind is LimitKind.INVALID]
+        counts = {}
+        for rule in rules:
+            counts[rule.kind.value] = counts.get(rule.kind.value, 0) + 1
+        print(json.dumps({"rules": len(rules), "kinds": counts, "problems": problems}, indent=2))
@@ -1,38 +1,44 @@
 
 import json
 import sys
-import re
-from thefuzz import fuzz
 
-def convert_to_mg_per_kg_or_l(value, unit):
-    """Converts a value to mg/kg or mg/L based on its unit."""
-    unit = unit.lower().strip()
-    if unit in ["mg/kg", "mg/l"]:
-        return value
-    if unit in ["g/kg", "g/l"]:
-        return value * 1000
-    if unit in ["kg/kg", "l/l"]:
-        return value * 1000000
-    return None  # Unit not recognized
+from additive_registry import get_registry, DEFAULT_DATA_FILE
+from compliance_rules import compile_rules, convert_to_mg_per_kg_or_l, LimitKind
+from fuzzy_matcher import get_matcher, DEFAULT_THRESHOLD
 
-def find_best_match(user_input, options):
+def find_best_match(user_input, options, threshold=DEFAULT_THRESHOLD):
     """Finds the best match for user input from a list of options using fuzzy matching."""
-    user_input = user_input.lower().strip()
-    best_match = None
-    highest_score = 0
-    for option in options:
-        score = fuzz.partial_ratio(user_input, option.lower())
-        if score > highest_score:
-            highest_score = score
-            best_match = option
-    
-    if highest_score >= 70:
-        return best_match
-    return None
+    best_match, _ = get_matcher(tuple(options)).match(user_input, threshold)
+    return best_match
 
-def evaluate_compliance(ingredient, concentration, food_product, regulation_data=None):
+def match_rules(additive_info, food_product, registry=None, match_threshold=DEFAULT_THRESHOLD, category_id=None):
+    """
+    Returns the compiled rules of an additive that apply to a food product.
+    With a registry, the category resolved across the whole registry is used when the additive
+    has rules for it or for a parent category, as in permitted_additives; otherwise the product is fuzzy matched against the additive's own categories.
+    """
+    if registry is not None:
+        # Use the food category resolved across the whole registry when rules of this additive apply to it
+        if category_id is None:
+            category_id = registry.resolve_category(food_product, match_threshold)
+        if category_id is not None:
+            matched_rules = registry.rules_for_category(additive_info, category_id)
+            if matched_rules:
+                return matched_rules
+
+    # Find matching food category using fuzzy matching
+    rules = registry.rules_for(additive_info) if registry is not None else compile_rules(additive_info)
+    category_names = [rule.category_name for rule in rules]
+    best_match_category = find_best_match(food_product, category_names, match_threshold)
+    if not best_match_category:
+        return []
+    return [rule for rule in rules if rule.category_name == best_match_category]
+
+def evaluate_compliance(ingredient, concentration, food_product, regulation_data=None, registry=None, match_threshold=DEFAULT_THRESHOLD, category_id=None):
     """
     Evaluates the compliance of a food additive based on EU regulations.
+    The additive is looked up in `registry`, which defaults to the shared registry of the local data file.
+    `category_id` is the food category resolved for `food_product`; it is resolved from the registry when omitted.
     """
     if regulation_data:
         additive_info = {
@@ -47,35 +53,18 @@ def evaluate_compliance(ingredient, concentration, food_product, regulation_data
             "regulation": regulation_data["source"]
         }
     else:
-        json_file_path = "/home/student_01_ab8595ac0887/hackathon_project/food_additives_data_v2.json"
-        
-        try:
-            with open(json_file_path, 'r') as f:
-                additives_data = json.load(f)
-        except FileNotFoundError:
-            return {"error": f"The file {json_file_path} was not found. Please ensure the data file is in place."}
-        except json.JSONDecodeError:
-            return {"error": f"Failed to decode the JSON from {json_file_path}."}
+        if registry is None:
+            try:
+                registry = get_registry()
+            except FileNotFoundError:
+                return {"error": f"The file {DEFAULT_DATA_FILE} was not found. Please ensure the data file is in place."}
+            except json.JSONDecodeError:
+                return {"error": f"Failed to decode the JSON from {DEFAULT_DATA_FILE}."}
+            except (OSError, ValueError) as e:
+                return {"error": f"The additive data could not be loaded: {e}"}
 
         # Find the additive in the local data
-        additive_info = None
-        is_e_number = re.match(r'e\d+', ingredient.lower())
-        
-        if is_e_number:
-            for ad in additives_data:
-                if ad.get('code', '').lower() == ingredient.lower():
-                    additive_info = ad
-                    break
-        else:
-            highest_score = 0
-            for ad in additives_data:
-                name_score = fuzz.partial_ratio(ingredient.lower(), ad.get('name', '').lower())
-                if name_score > highest_score:
-                    highest_score = name_score
-                    additive_info = ad
-            
-            if highest_score < 70:
-                additive_info = None
+        additive_info = registry.find_additive(ingredient, threshold=match_threshold)
 
         if not additive_info:
             return {"error": f"Ingredient '{ingredient}' not found in the local food additives database."}
@@ -87,11 +76,9 @@ def evaluate_compliance(ingredient, concentration, food_product, regulation_data
         return {"error": f"Invalid concentration format: '{concentration}'. Expected format: '<value> <unit>'"}
 
     results = []
-    # Find matching food category using fuzzy matching
-    category_names = [cat.get("category_name", "") for cat in additive_info.get("food_categories", [])]
-    best_match_category = find_best_match(food_product, category_names)
+    matched_rules = match_rules(additive_info, food_product, None if regulation_data else registry, match_threshold, category_id)
 
-    if not best_match_category:
+    if not matched_rules:
         # Check for globally forbidden additives
         if additive_info.get("max_level") == "Not permitted":
              return [{
@@ -102,56 +89,50 @@ def evaluate_compliance(ingredient, concentration, food_product, regulation_data
             }]
         return {"error": f"No rules found for ingredient '{ingredient}' in the specified food product '{food_product}'. It may not be authorized for this use."}
 
-    for category in additive_info.get("food_categories", []):
-        if category.get("category_name") == best_match_category:
-            max_level_str = category.get('max_level', '').strip()
-            
-            if max_level_str.lower() == 'quantum satis':
-                results.append({
-                    "ingredient": f"{additive_info.get('code', ingredient)} ({additive_info.get('name', ingredient)})",
-                    "status": "Compliant",
-                    "reason": f"Authorized under 'quantum satis' (no numerical limit) for food category '{category['category_name']}'. The provided level is acceptable.",
-                    "regulation_reference": additive_info.get('regulation', 'N/A')
-                })
-                continue
-
-            max_level_match = re.search(r'(\d+\.?\d*)\s*(.*)', max_level_str)
-            if max_level_match:
-                max_level_value = float(max_level_match.group(1))
-                max_level_unit = max_level_match.group(2).strip()
-
-                converted_concentration = convert_to_mg_per_kg_or_l(concentration_value, concentration_unit)
-                converted_max_level = convert_to_mg_per_kg_or_l(max_level_value, max_level_unit)
-
-                if converted_concentration is None:
-                    results.append({"error": f"Unrecognized unit: {concentration_unit}"})
-                    continue
-                
-                if converted_max_level is None:
-                    results.append({"error": f"Unrecognized unit in max level: {max_level_unit}"})
-                    continue
-
-                if converted_concentration <= converted_max_level:
-                    results.append({
-                        "ingredient": f"{additive_info.get('code', ingredient)} ({additive_info.get('name', ingredient)})",
-                        "status": "Compliant",
-                        "reason": f"Requested concentration {concentration} is within the maximum limit of {max_level_str} for food category '{category['category_name']}'.",
-                        "regulation_reference": additive_info.get('regulation', 'N/A')
-                    })
-                else:
-                    results.append({
-                        "ingredient": f"{additive_info.get('code', ingredient)} ({additive_info.get('name', ingredient)})",
-                        "status": "Conditionally allowed",
-                        "reason": f"Requested concentration {concentration} exceeds the maximum limit of {max_level_str} for food category '{category['category_name']}'.",
-                        "regulation_reference": additive_info.get('regulation', 'N/A')
-                    })
-            else:
-                 results.append({
-                    "ingredient": f"{additive_info.get('code', ingredient)} ({additive_info.get('name', ingredient)})",
-                    "status": "Conditionally allowed",
-                    "reason": f"A non-numerical limit '{max_level_str}' applies for food category '{category['category_name']}'. Manual verification is required.",
-                    "regulation_reference": additive_info.get('regulation', 'N/A')
-                })
+    ingredient_label = f"{additive_info.get('code', ingredient)} ({additive_info.get('name', ingredient)})"
+    regulation_reference = additive_info.get('regulation', 'N/A')
+    converted_concentration = convert_to_mg_per_kg_or_l(concentration_value, concentration_unit)
+
+    for rule in matched_rules:
+        if rule.kind is LimitKind.QUANTUM_SATIS:
+            results.append({
+                "ingredient": ingredient_label,
+                "status": "Compliant",
+                "reason": f"Authorized under 'quantum satis' (no numerical limit) for food category '{rule.category_name}'. The provided level is acceptable.",
+                "regulation_reference": regulation_reference
+            })
+        elif rule.kind is LimitKind.NOT_PERMITTED:
+            results.append({
+                "ingredient": ingredient_label,
+                "status": "Forbidden",
+                "reason": f"{additive_info.get('name', ingredient)} is not permitted in food category '{rule.category_name}'.",
+                "regulation_reference": regulation_reference
+            })
+        elif rule.kind is LimitKind.NON_NUMERIC:
+            results.append({
+                "ingredient": ingredient_label,
+                "status": "Conditionally allowed",
+                "reason": f"A non-numerical limit '{rule.max_level}' applies for food category '{rule.category_name}'. Manual verification is required.",
+                "regulation_reference": regulation_reference
+            })
+        elif converted_concentration is None:
+            results.append({"error": f"Unrecognized unit: {concentration_unit}"})
+        elif rule.kind is LimitKind.INVALID:
+            results.append({"error": rule.problem})
+        elif converted_concentration <= rule.limit:
+            results.append({
+                "ingredient": ingredient_label,
+                "status": "Compliant",
+                "reason": f"Requested concentration {concentration} is within the maximum limit of {rule.max_level} for food category '{rule.category_name}'.",
+                "regulation_reference": regulation_reference
+            })
+        else:
+            results.append({
+                "ingredient": ingredient_label,
+                "status": "Conditionally allowed",
+                "reason": f"Requested concentration {concentration} exceeds the maximum limit of {rule.max_level} for food category '{rule.category_name}'.",
+                "regulation_reference": regulation_reference
+            })
 
     return results
 
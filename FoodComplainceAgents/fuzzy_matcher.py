@@ -0,0 +1,90 @@
+import heapq
+from collections import Counter, defaultdict
+from itertools import chain
+from functools import lru_cache
+
+from thefuzz import fuzz
+
+DEFAULT_THRESHOLD = 70
+
+def trigrams(text):
+    """Returns the set of character trigrams of a lowercased, space-padded string."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FuzzyMatcher:
+    """
+    Matches free text against a fixed list of options with `fuzz.partial_ratio`.
+
+    Instead of scoring every option, a trigram inverted index narrows the options
+    down to the ones sharing the most trigrams with the query, and only that
+    shortlist is scored. Small option lists are scored directly.
+    """
+
+    def __init__(self, options, threshold=DEFAULT_THRESHOLD, max_candidates=32, min_indexed_options=64):
+        self.options = list(options)
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self._lowered = [option.lower() for option in self.options]
+        self._index = None
+        if len(self.options) >= min_indexed_options:
+            self._index = defaultdict(list)
+            for position, option in enumerate(self._lowered):
+                for gram in trigrams(option):
+                    self._index[gram].append(position)
+
+    def candidates(self, query):
+        """Returns the positions of the options worth scoring for a lowercased query, in option order."""
+        if self._index is None or len(query) < 3:
+            return range(len(self.options))
+
+        shared = Counter(chain.from_iterable(self._index.get(gram, ()) for gram in trigrams(query)))
+        if len(shared) > self.max_candidates:
+            # Ties are broken by option order; Counter order follows set iteration, which varies between runs
+            shortlist = heapq.nsmallest(self.max_candidates, shared, key=lambda position: (-shared[position], position))
+        else:
+            shortlist = shared
+        return sorted(shortlist)
+
+    def score(self, query):
+        """Returns (best_option, score) for a query, regardless of the threshold."""
+        query = query.lower().strip()
+        best_match = None
+        highest_score = 0
+        for position in self.candidates(query):
+            score = fuzz.partial_ratio(query, self._lowered[position])
+            if score > highest_score:
+                highest_score = score
+                best_match = self.options[position]
+        return best_match, highest_score
+
+    def match(self, query, threshold=None):
+        """Returns (best_option, score); best_option is None if the score is below the threshold."""
+        threshold = self.threshold if threshold is None else threshold
+        best_match, score = self.score(query)
+        if score >= threshold:
+            return best_match, score
+        return None, score
+
+    def match_many(self, queries, threshold=None):
+        """Matches many queries against all options, returning (best_option, score) per query in input order."""
+        return [self.match(query, threshold) for query in queries]
+
+def brute_force_match(query, options, threshold=DEFAULT_THRESHOLD):
+    """Scores every option; the reference implementation the matcher is benchmarked against."""
+    query = query.lower().strip()
+    best_match = None
+    highest_score = 0
+    for option in options:
+        score = fuzz.partial_ratio(query, option.lower())
+        if score > highest_score:
+            highest_score = score
+            best_match = option
+    if highest_score >= threshold:
+        return best_match, highest_score
+    return None, highest_score
+
+@lru_cache(maxsize=1024)
+def get_matcher(options):
+    """Returns a cached matcher for a tuple of options."""
+    return FuzzyMatcher(options)
@@ -0,0 +1,201 @@
+"""
+"What if" concentration sweeps and reformulation headroom.
+
+Instead of evaluating one concentration at a time, a sweep compares a whole vector of
+candidate concentrations with the canonical limit of the matching rule in one step, and
+returns the status and the remaining headroom (limit minus concentration, in mg/kg or
+mg/L) of every point, plus the maximum permitted level. Recipes are swept by scaling every
+additive's concentration by the same factors.
+
+NumPy is used when it is installed; otherwise the same results are computed with lists.
+"""
+import json
+import sys
+
+from additive_registry import get_registry
+from compliance_rules import LimitKind, convert_to_mg_per_kg_or_l
+from evaluator_agent import match_rules
+from fuzzy_matcher import DEFAULT_THRESHOLD
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_POINTS = 1000000
+
+# The overall status of a recipe is the most severe status of its additives
+SEVERITY = {"Compliant": 0, "Conditionally allowed": 1, "Forbidden": 2, "Error": 3}
+
+# When several rules apply, the most restrictive one decides
+RESTRICTIVENESS = {LimitKind.NOT_PERMITTED: 0, LimitKind.NUMERIC: 1, LimitKind.NON_NUMERIC: 2, LimitKind.QUANTUM_SATIS: 3}
+
+def concentration_points(concentrations=None, start=None, stop=None, num=50, max_points=MAX_POINTS):
+    """
+    Returns the candidate concentrations: the given list, or `num` evenly spaced points from start to stop.
+    Raises ValueError for more than `max_points` points, before any list is built.
+    """
+    if concentrations is not None:
+        if len(concentrations) > max_points:
+            raise ValueError(f"A sweep is limited to {max_points} points.")
+        return [float(value) for value in concentrations]
+    if start is None or stop is None:
+        raise ValueError("Pass either a list of concentrations or a start and stop.")
+    num = int(num)
+    if num > max_points:
+        raise ValueError(f"A sweep is limited to {max_points} points.")
+    if num < 2:
+        return [float(start)]
+    step = (stop - start) / (num - 1)
+    return [start + step * position for position in range(num)]
+
+def effective_rule(rules):
+    """Picks the rule that decides a sweep: not permitted, then the lowest numeric limit, then the others."""
+    usable = [rule for rule in rules if rule.kind is not LimitKind.INVALID]
+    if not usable:
+        return None
+    return min(usable, key=lambda rule: (RESTRICTIVENESS[rule.kind], rule.limit or 0.0))
+
+def compare_with_limit(points, factor, limit):
+    """
+    Converts points to canonical units and returns (compliant flags, headroom) against a numeric limit.
+    Values are rounded to 9 decimals so that e.g. 0.015 % is exactly 150 mg/kg.
+    """
+    if np is not None:
+        values = np.round(np.asarray(points, dtype=float) * factor, 9)
+        return (values <= limit).tolist(), (limit - values).tolist()
+    values = [round(value * factor, 9) for value in points]
+    return [value <= limit for value in values], [limit - value for value in values]
+
+def max_permitted_level(ingredient, food_product, registry=None, match_threshold=DEFAULT_THRESHOLD, category_id=None):
+    """
+    Returns the maximum permitted level of an additive in a food product as
+    {"ingredient", "food_category", "category_id", "max_level", "kind", "limit", "unit"},
+    or {"error": ...}. `limit` is in mg/kg or mg/L; it is 0 when the additive is not
+    permitted and None when no numerical limit applies.
+    """
+    if registry is None:
+        try:
+            registry = get_registry()
+        except (OSError, ValueError) as e:
+            return {"error": f"The additive data could not be loaded: {e}"}
+
+    additive_info = registry.find_additive(ingredient, threshold=match_threshold)
+    if not additive_info:
+        return {"error": f"Ingredient '{ingredient}' not found in the local food additives database."}
+
+    rule = effective_rule(match_rules(additive_info, food_product, registry, match_threshold, category_id))
+    if rule is None:
+        return {"error": f"No rules found for ingredient '{ingredient}' in the specified food product '{food_product}'. It may not be authorized for this use."}
+
+    limit = rule.limit if rule.kind is LimitKind.NUMERIC else (0.0 if rule.kind is LimitKind.NOT_PERMITTED else None)
+    return {
+        "ingredient": f"{additive_info.get('code', ingredient)} ({additive_info.get('name', ingredient)})",
+        "food_category": rule.category_name,
+        "category_id": rule.category_id,
+        "max_level": rule.max_level,
+        "kind": rule.kind.value,
+        "limit": limit,
+        "unit": rule.unit
+    }
+
+def sweep(ingredient, food_product, concentrations=None, unit="mg/kg", start=None, stop=None, num=50,
+          registry=None, match_threshold=DEFAULT_THRESHOLD, category_id=None):
+    """
+    Evaluates an additive at many concentrations (in `unit`) in one call.
+
+    Returns the maximum permitted level plus, per point, the status ("Compliant",
+    "Conditionally allowed" above the limit, or "Forbidden") and the headroom in mg/kg
+    or mg/L. Headroom is None where no numerical limit applies.
+    """
+    level = max_permitted_level(ingredient, food_product, registry, match_threshold, category_id)
+    if "error" in level:
+        return level
+
+    factor = convert_to_mg_per_kg_or_l(1.0, unit)
+    if factor is None:
+        return {"error": f"Unrecognized unit: {unit}"}
+    try:
+        points = concentration_points(concentrations, start, stop, num)
+    except (TypeError, ValueError) as e:
+        return {"error": f"Invalid concentrations: {e}"}
+
+    kind = LimitKind(level["kind"])
+    if kind is LimitKind.NUMERIC:
+        compliant, headroom = compare_with_limit(points, factor, level["limit"])
+        status = ["Compliant" if flag else "Conditionally allowed" for flag in compliant]
+    else:
+        fixed_status = {LimitKind.NOT_PERMITTED: "Forbidden", LimitKind.QUANTUM_SATIS: "Compliant",
+                        LimitKind.NON_NUMERIC: "Conditionally allowed"}[kind]
+        status = [fixed_status] * len(points)
+        headroom = [None] * len(points)
+
+    return dict(level, **{
+        "requested_unit": unit,
+        "concentrations": points,
+        "status": status,
+        "headroom": headroom,
+        "compliant_points": status.count("Compliant")
+    })
+
+def recipe_headroom(recipe, food_product, scales=None, start=0.5, stop=2.0, num=16, registry=None, match_threshold=DEFAULT_THRESHOLD):
+    """
+    Sweeps a whole recipe, a list of {"name": ..., "concentration": "<value> <unit>"} additives,
+    by scaling every concentration by the same factors. The additives times the factors are
+    limited to MAX_POINTS points.
+
+    Returns one sweep per additive, the overall status per factor ("Compliant" only if every
+    additive is) and `max_scale`, the largest factor at which the recipe stays compliant
+    (None if no numerical limit bounds it).
+    """
+    if registry is None:
+        try:
+            registry = get_registry()
+        except (OSError, ValueError) as e:
+            return {"error": f"The additive data could not be loaded: {e}"}
+    if not isinstance(recipe, list) or not recipe:
+        return {"error": "A recipe is a non-empty list of {\"name\", \"concentration\"} additives."}
+    try:
+        factors = concentration_points(scales, start, stop, num, max_points=MAX_POINTS // len(recipe))
+    except (TypeError, ValueError) as e:
+        return {"error": f"Invalid scale factors: {e}"}
+
+    additives = []
+    recipe_status = ["Compliant"] * len(factors)
+    max_scale = None
+    for item in recipe:
+        try:
+            value_str, unit = item["concentration"].split()
+            value = float(value_str.replace(",", "."))
+        except (KeyError, AttributeError, ValueError):
+            additives.append({"ingredient": item.get("name"), "error": f"Invalid concentration format: '{item.get('concentration')}'. Expected format: '<value> <unit>'"})
+            recipe_status = ["Error"] * len(factors)
+            continue
+
+        result = sweep(item["name"], food_product, [value * factor for factor in factors], unit, registry=registry, match_threshold=match_threshold)
+        if "error" in result:
+            additives.append({"ingredient": item["name"], "error": result["error"]})
+            recipe_status = ["Error"] * len(factors)
+            continue
+        additives.append(result)
+        recipe_status = [max(overall, status, key=SEVERITY.get) for overall, status in zip(recipe_status, result["status"])]
+        canonical_value = value * convert_to_mg_per_kg_or_l(1.0, unit)
+        if result["kind"] == LimitKind.NOT_PERMITTED.value:
+            max_scale = 0.0
+        elif result["limit"] is not None and canonical_value > 0:
+            scale = result["limit"] / canonical_value
+            max_scale = scale if max_scale is None else min(max_scale, scale)
+
+    return {
+        "food_category": food_product,
+        "scales": factors,
+        "status": recipe_status,
+        "max_scale": max_scale,
+        "additives": additives
+    }
+
+if __name__ == '__main__':
+    if len(sys.argv) < 5:
+        print("Usage: python headroom.py <ingredient> <food_product> <unit> <concentration> [<concentration> ...]")
+    else:
+        print(json.dumps(sweep(sys.argv[1], sys.argv[2], [float(value) for value in sys.argv[4:]], sys.argv[3]), indent=2))
@@ -5,11 +5,15 @@ import base64
 def judge_evaluation(evaluation_output):
     """
     Reviews the output of the evaluator agent to ensure it meets quality standards.
+    Accepts either the evaluator's JSON output or the already decoded result.
     """
-    try:
-        evaluation_data = json.loads(evaluation_output)
-    except json.JSONDecodeError as e:
-        return {"error": f"Invalid JSON format from evaluator: {e}"}
+    if isinstance(evaluation_output, (str, bytes)):
+        try:
+            evaluation_data = json.loads(evaluation_output)
+        except json.JSONDecodeError as e:
+            return {"error": f"Invalid JSON format from evaluator: {e}"}
+    else:
+        evaluation_data = evaluation_output
 
     if isinstance(evaluation_data, dict) and 'error' in evaluation_data:
         return evaluation_data # Pass through evaluator errors
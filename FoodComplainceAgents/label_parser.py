@@ -0,0 +1,199 @@
+"""
+Deterministic parser for ingredient labels such as
+
+    ORANGE BLAST
+
+    Ingredients:
+    Water (85–90%)
+    Citric Acid (E330) 0,1–0,25%
+    Sodium Benzoate (E211), preservative (up to 150 mg/L (0,015%))
+    Colour: Sunset Yellow FCF (E110) up to 20 mg/L (0,002%), colouring
+
+Ingredients are separated by newlines, commas or semicolons outside parentheses. Decimal
+commas are accepted; commas followed by groups of three digits, as in 1,000 mg/kg, group
+thousands unless the number starts with 0, as in 0,015%. For ranges the upper bound is
+used, as that is the level the product may reach. Concentrations are converted to mg/kg,
+or to mg/L for liquids.
+
+The food category comes from a "Category:" line or list entry, from keywords in the product
+name (e.g. "drink", "jam") or, when the label gives levels per litre, defaults to Beverages.
+Text that does not look like an ingredient list is left to the LLM helper: parse_label()
+returns None for it.
+"""
+import json
+import re
+import sys
+
+from compliance_rules import convert_to_mg_per_kg_or_l
+
+HEADER_PATTERN = re.compile(r'\bingredients?\s*[:\-]', re.IGNORECASE)
+CATEGORY_LINE_PATTERN = re.compile(r'^\s*(?:food\s+)?category\s*:\s*(?P<category>.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+# "Category: Beverages" within an ingredient list ends at the next separator
+CATEGORY_CLAUSE_PATTERN = re.compile(r'[,;]\s*(?:food\s+)?category\s*:\s*(?P<category>[^,;\n]+?)\s*(?=[,;\n]|$)', re.IGNORECASE)
+BLANK_LINE_PATTERN = re.compile(r'\n\s*\n')
+# A comma between digits is a decimal comma or groups thousands, e.g. 0,015% or 1,000 mg/kg
+SEPARATOR_PATTERN = re.compile(r'[();\n]|(?<!\d),|,(?!\d)')
+NUMBER = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:[.,]\d+)?'
+THOUSANDS_PATTERN = re.compile(r'[1-9]\d{0,2}(?:,\d{3})+(?:\.\d+)?')
+LEVEL_PATTERN = re.compile(
+    r'(?:(?:up\s+to|max(?:imum)?\.?|<=|≤|<)\s*)?'
+    rf'(?P<low>{NUMBER})\s*(?:(?:-|–|—|to)\s*(?P<high>{NUMBER})\s*)?'
+    r'(?P<unit>%|ppm|mg/kg|mg/l|g/kg|g/l)(?![a-z])',
+    re.IGNORECASE)
+LEVEL_GROUP_PATTERN = re.compile(r'\([^()]*\)')
+E_NUMBER_GROUP_PATTERN = re.compile(r'\(\s*E\s?-?\d{3,4}[a-z]?\s*\)', re.IGNORECASE)
+FUNCTION_PREFIX_PATTERN = re.compile(r'^(?P<function>[a-z ]+?)\s*:\s*', re.IGNORECASE)
+LIST_MARKER_PATTERN = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+
+FUNCTION_WORDS = {
+    "acid", "acidifier", "acidity regulator", "acidity regulators", "antioxidant", "antioxidants",
+    "colour", "colours", "colouring", "color", "colors", "coloring", "emulsifier", "emulsifiers",
+    "flavour enhancer", "gelling agent", "preservative", "preservatives", "raising agent",
+    "stabiliser", "stabilisers", "stabilizer", "stabilizers", "sweetener", "sweeteners", "thickener", "thickeners"
+}
+
+# Keywords in the product name, checked in order
+CATEGORY_HINTS = [
+    (re.compile(r'\b(?:drinks?|beverages?|sodas?|lemonades?|juices?|colas?|squash)\b', re.IGNORECASE), "Beverages"),
+    (re.compile(r'\b(?:jams?|marmalades?|jell(?:y|ies)|fruit spreads?)\b', re.IGNORECASE), "Jams"),
+    (re.compile(r'\bchocolates?\b', re.IGNORECASE), "Chocolate")
+]
+LIQUID_CATEGORY = "Beverages"
+UNKNOWN_CATEGORY = "Unknown"
+
+# Entries longer than this are prose rather than ingredient names
+MAX_NAME_WORDS = 8
+
+def parse_number(text):
+    if THOUSANDS_PATTERN.fullmatch(text):
+        return float(text.replace(",", ""))
+    return float(text.replace(",", "."))
+
+def format_level(value):
+    """Formats a level without exponent notation, e.g. 1500000 rather than 1.5e+06."""
+    return f"{value:.6f}".rstrip("0").rstrip(".")
+
+def split_entries(text):
+    """Splits an ingredient list on newlines, and on commas and semicolons that are not inside parentheses."""
+    entries = []
+    depth = 0
+    start = 0
+    for match in SEPARATOR_PATTERN.finditer(text):
+        character = match.group()
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0 or character == "\n":
+            entries.append(text[start:match.start()])
+            start = match.end()
+            depth = 0
+    entries.append(text[start:])
+    return [entry.strip() for entry in entries if entry.strip()]
+
+def parse_level(text):
+    """
+    Returns (value, unit) of the first stated level in the text, or None. Levels with a
+    mass or volume unit are preferred over percentages stated next to them; for a range
+    the higher bound is returned.
+    """
+    levels = []
+    for match in LEVEL_PATTERN.finditer(text):
+        values = [parse_number(match.group("low"))]
+        if match.group("high"):
+            values.append(parse_number(match.group("high")))
+        levels.append((max(values), match.group("unit").lower()))
+    if not levels:
+        return None
+    return next((level for level in levels if level[1] != "%"), levels[0])
+
+def strip_levels(text):
+    """Removes the stated levels and any parenthesized groups holding them from an entry."""
+    # Innermost groups first, so "(up to 150 mg/L (0,015%))" is removed as a whole
+    previous = None
+    while previous != text:
+        previous = text
+        text = LEVEL_GROUP_PATTERN.sub(lambda group: "" if LEVEL_PATTERN.search(group.group()) else group.group(), text)
+    match = LEVEL_PATTERN.search(text)
+    if match:
+        text = text[:match.start()]
+    # A name ends with its E-number, e.g. "Citric Acid (E330)"
+    e_number = E_NUMBER_GROUP_PATTERN.search(text)
+    if e_number:
+        text = text[:e_number.end()]
+    return text.strip(" \t.:-")
+
+def clean_name(entry):
+    """Returns the ingredient name of an entry without list markers, function prefixes and levels."""
+    entry = LIST_MARKER_PATTERN.sub("", entry)
+    prefix = FUNCTION_PREFIX_PATTERN.match(entry)
+    if prefix and prefix.group("function").lower().strip() in FUNCTION_WORDS:
+        entry = entry[prefix.end():]
+    return " ".join(strip_levels(entry).split())
+
+def food_category_hint(title, levels):
+    """Returns the food category suggested by the product name or, for levels per litre, Beverages."""
+    for pattern, category in CATEGORY_HINTS:
+        if pattern.search(title):
+            return category
+    if any(unit.endswith("/l") for _, unit in levels):
+        return LIQUID_CATEGORY
+    return UNKNOWN_CATEGORY
+
+def parse_label(text):
+    """
+    Parses a label into {"food_category": ..., "ingredients": [{"name", "concentration"}]},
+    the format of LLMHelperAgent.extract_context, or returns None if the text does not look
+    like an ingredient list. Concentrations are "<value> mg/kg" or "<value> mg/L", or "N/A".
+    """
+    header = HEADER_PATTERN.search(text)
+    if header:
+        title = text[:header.start()]
+        # The list ends at the first blank line after it
+        body = next((chunk for chunk in BLANK_LINE_PATTERN.split(text[header.end():]) if chunk.strip()), "")
+    else:
+        title, body = text, text
+    category_line = CATEGORY_LINE_PATTERN.search(text) or CATEGORY_CLAUSE_PATTERN.search(text)
+    if category_line:
+        body = CATEGORY_CLAUSE_PATTERN.sub("", CATEGORY_LINE_PATTERN.sub("", body))
+
+    ingredients = []
+    levels = []
+    for entry in split_entries(body):
+        name = clean_name(entry)
+        level = parse_level(entry)
+        if not name or name.lower() in FUNCTION_WORDS:
+            # "preservative (up to 150 mg/L)" states the level of the ingredient before it
+            if level and ingredients and ingredients[-1]["level"] is None:
+                ingredients[-1]["level"] = level
+                levels.append(level)
+            continue
+        if len(name.split()) > MAX_NAME_WORDS:
+            return None
+        ingredients.append({"name": name, "level": level})
+        if level:
+            levels.append(level)
+
+    if not ingredients or (not header and len(ingredients) == 1 and not levels):
+        return None
+
+    food_category = category_line.group("category") if category_line else food_category_hint(title, levels)
+    liquid = food_category == LIQUID_CATEGORY or any(unit.endswith("/l") for _, unit in levels)
+    context_ingredients = []
+    for ingredient in ingredients:
+        concentration = "N/A"
+        if ingredient["level"] is not None:
+            value, unit = ingredient["level"]
+            converted = convert_to_mg_per_kg_or_l(value, unit)
+            # Percentages are per kg, or per litre for liquids
+            canonical = "mg/L" if unit.endswith("/l") or (unit == "%" and liquid) else "mg/kg"
+            concentration = f"{format_level(converted)} {canonical}"
+        context_ingredients.append({"name": ingredient["name"], "concentration": concentration})
+    return {"food_category": food_category, "ingredients": context_ingredients}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python label_parser.py <label text> (or - to read it from stdin)")
+    else:
+        label = sys.stdin.read() if sys.argv[1] == "-" else sys.argv[1]
+        print(json.dumps(parse_label(label), indent=2))
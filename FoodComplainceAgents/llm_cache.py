@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from llm_helper import LLMHelperAgent
+from additive_registry import additive_aliases
+from telemetry import metrics
+
+# Seconds a process waits for another one to finish writing to a shared cache file
+SQLITE_BUSY_TIMEOUT = 10
+
+def normalize_input(text):
+    """Normalizes an ingredient string for use in a cache key: case and whitespace are ignored."""
+    return " ".join(str(text).lower().split())
+
+class SQLiteStore:
+    """
+    Persistent key/value store backing the in-memory caches, so entries survive restarts.
+    Values are stored as JSON together with their expiry time (or NULL for no expiry).
+
+    File databases use write-ahead logging, so several server worker processes can share
+    one cache file: readers do not block the writer. Every process opens its own
+    connection, also when the store was created before the server forked its workers.
+    """
+
+    def __init__(self, path, table="cache"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._connect()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        if self.path != ":memory:":
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+        connection.commit()
+        self._connection = connection
+        self._pid = os.getpid()
+
+    def _execute(self, statement, parameters=(), commit=False):
+        # Must be called with self._lock held; a forked worker opens its own connection
+        if self._pid != os.getpid() and self.path != ":memory:":
+            self._connect()
+        cursor = self._connection.execute(statement.format(table=self.table), parameters)
+        if commit:
+            self._connection.commit()
+        return cursor
+
+    def get(self, key):
+        """Returns the stored value, or None if it is missing or expired."""
+        with self._lock:
+            row = self._execute("SELECT value, expires_at FROM {table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._execute("INSERT OR REPLACE INTO {table} (key, value, expires_at) VALUES (?, ?, ?)",
+                          (key, json.dumps(value), expires_at), commit=True)
+
+    def delete(self, key):
+        with self._lock:
+            self._execute("DELETE FROM {table} WHERE key = ?", (key,), commit=True)
+
+    def delete_before(self, key):
+        """Deletes every entry whose key sorts before `key`."""
+        with self._lock:
+            self._execute("DELETE FROM {table} WHERE key < ?", (key,), commit=True)
+
+    def clear(self):
+        with self._lock:
+            self._execute("DELETE FROM {table}", commit=True)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class LLMCache:
+    """
+    Memoizes LLM helper results keyed on the task and the normalized input.
+
+    Entries live in a bounded in-memory LRU with an optional time-to-live. When a
+    `store` (e.g. SQLiteStore) is given, entries are also written through to it
+    and read back on in-memory misses.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, store=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(task, value):
+        return f"{task}:{value}"
+
+    def get(self, task, value):
+        """Returns the cached result for (task, value) or None."""
+        key = self.make_key(task, value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("llm_cache_lookups_total", task=task, result="hit")
+                    return result
+                del self._entries[key]
+
+        result = self.store.get(key) if self.store else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                metrics.inc("llm_cache_lookups_total", task=task, result="miss")
+                return None
+            self.hits += 1
+            metrics.inc("llm_cache_lookups_total", task=task, result="store_hit")
+            self._remember(key, result, self._expiry())
+        return result
+
+    def set(self, task, value, result):
+        key = self.make_key(task, value)
+        expires_at = self._expiry()
+        with self._lock:
+            self._remember(key, result, expires_at)
+        if self.store:
+            self.store.set(key, result, expires_at)
+
+    def _expiry(self):
+        return time.time() + self.ttl if self.ttl else None
+
+    def _remember(self, key, result, expires_at):
+        self._entries[key] = (result, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.store:
+            self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+class CachedLLMHelperAgent:
+    """LLMHelperAgent wrapper that answers repeated classify/normalize/explain calls from an LLMCache."""
+
+    def __init__(self, agent=None, cache=None):
+        self.agent = agent or LLMHelperAgent()
+        self.cache = cache if cache is not None else LLMCache()
+
+    def _cached(self, task, key, compute):
+        result = self.cache.get(task, key)
+        if result is None:
+            result = compute()
+            # Errors are not cached so that they are retried
+            if "error" not in result:
+                self.cache.set(task, key, result)
+        return dict(result)
+
+    def extract_context(self, text):
+        return self.agent.extract_context(text)
+
+    def classify_ingredient(self, ingredient_name):
+        return self._cached("classify", normalize_input(ingredient_name),
+                            lambda: self.agent.classify_ingredient(ingredient_name))
+
+    def normalize_ingredient(self, ingredient_name):
+        return self._cached("normalize", normalize_input(ingredient_name),
+                            lambda: self.agent.normalize_ingredient(ingredient_name))
+
+    def generate_explanation(self, compliance_data):
+        return self._cached("explain", json.dumps(compliance_data, sort_keys=True),
+                            lambda: self.agent.generate_explanation(compliance_data))
+
+def warm_from_registry(cache, registry):
+    """
+    Pre-populates the cache from the additive registry: every code, name and synonym
+    (also in the "Name (E-number)" label form) is classified as an additive, and
+    names and synonyms normalize to their E-number.
+    Returns the number of entries written.
+    """
+    count = 0
+    for additive in registry.additives:
+        code = additive.get("code")
+        names = additive_aliases(additive)
+        if code:
+            names.extend([f"{name} ({code})" for name in names] + [code])
+        for name in names:
+            cache.set("classify", normalize_input(name), {"is_additive": True})
+            count += 1
+            if code:
+                cache.set("normalize", normalize_input(name), {"normalized_ingredient": code})
+                count += 1
+    return count
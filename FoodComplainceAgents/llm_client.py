@@ -0,0 +1,402 @@
+"""
+Asynchronous client for the model behind the LLM helper.
+
+A ModelBackend answers a batch of inputs of one task ("classify", "normalize" or "explain")
+in one model call. The AsyncLLMClient in front of it adds:
+- coalescing of concurrent identical requests, which share one answer,
+- micro-batching: requests of the same task that arrive within `batch_window` seconds,
+  from any ingredient or HTTP request, are sent as one model call,
+- a token bucket limiting model calls per second, and a bound on concurrent calls.
+
+HTTPModelBackend talks to a model server over a pool of keep-alive connections, and
+FakeModelServer is a local model server for tests and benchmarks that answers with the
+rules of LLMHelperAgent. AsyncLLMHelperAgent adapts the client to the synchronous
+LLMHelperAgent interface used by the pipeline.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from llm_cache import normalize_input
+from llm_helper import LLMHelperAgent
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("llm_model_calls_total", "Model calls (batches) sent to the model backend by task.")
+metrics.describe("llm_model_inputs_total", "Inputs sent to the model backend by task.")
+metrics.describe("llm_requests_coalesced_total", "Requests answered by a concurrent identical request by task.")
+
+TASKS = ("classify", "normalize", "explain")
+
+class ModelBackendError(Exception):
+    """Raised when the model backend fails or returns a malformed answer."""
+
+def answer(agent, task, value):
+    """Answers one input of a task with the rules of an LLMHelperAgent."""
+    if task == "classify":
+        return agent.classify_ingredient(value)
+    if task == "normalize":
+        return agent.normalize_ingredient(value)
+    if task == "explain":
+        return agent.generate_explanation(value)
+    return {"error": f"Unknown task: {task}"}
+
+class ModelBackend:
+    """Interface of model backends. `complete` returns one result dict per input, in input order."""
+
+    name = "base"
+
+    async def complete(self, task, inputs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class LocalModelBackend(ModelBackend):
+    """Answers in-process with the rules of LLMHelperAgent. It can simulate model latency and counts its calls."""
+
+    name = "local"
+
+    def __init__(self, agent=None, latency=0.0):
+        self.agent = agent or LLMHelperAgent()
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, task, inputs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [answer(self.agent, task, value) for value in inputs]
+
+class ConnectionPool:
+    """Keeps up to `size` idle keep-alive HTTP connections to one host for reuse."""
+
+    def __init__(self, url, size=8, timeout=30.0):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.connection_class(self.host, self.port, timeout=self.timeout)
+
+    def release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+class HTTPModelBackend(ModelBackend):
+    """
+    Sends batches as POST <url> {"task": ..., "inputs": [...]} and expects {"results": [...]}.
+    Requests run in worker threads over pooled keep-alive connections, at most `max_connections` at a time.
+    """
+
+    name = "http"
+
+    def __init__(self, url, max_connections=8, timeout=30.0):
+        self.url = url
+        self.path = urlsplit(url).path or "/"
+        self.pool = ConnectionPool(url, max_connections, timeout)
+        self._slots = None
+        self.max_connections = max_connections
+
+    def _post(self, payload):
+        connection = self.pool.acquire()
+        try:
+            connection.request("POST", self.path, body=payload, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        self.pool.release(connection)
+        if response.status != 200:
+            raise ModelBackendError(f"Model server returned {response.status}: {body[:200]!r}")
+        return json.loads(body)
+
+    async def complete(self, task, inputs):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            data = await asyncio.to_thread(self._post, json.dumps({"task": task, "inputs": inputs}))
+        results = data.get("results")
+        if not isinstance(results, list) or len(results) != len(inputs):
+            raise ModelBackendError(f"Model server returned {len(results or [])} results for {len(inputs)} inputs")
+        return results
+
+    async def close(self):
+        self.pool.close()
+
+class RateLimiter:
+    """Token bucket allowing `rate` model calls per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncLLMClient:
+    """
+    Coalescing, micro-batching and rate-limited front end for a ModelBackend.
+
+    All requests run on one event loop: async callers must use the client's loop, and
+    synchronous callers use request_sync(), which submits to a background loop shared by
+    all threads, so identical requests from different threads are coalesced as well.
+    """
+
+    def __init__(self, backend, batch_window=0.005, max_batch_size=32, max_concurrent_calls=8, rate_limit=None, burst=1):
+        self.backend = backend
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_concurrent_calls = max_concurrent_calls
+        self.rate_limiter = RateLimiter(rate_limit, burst) if rate_limit else None
+        self.requests = 0
+        self.coalesced = 0
+        self.model_calls = 0
+        self.model_inputs = 0
+        self._in_flight = {}
+        self._pending = {task: [] for task in TASKS}
+        self._flush_handles = {}
+        self._call_slots = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @staticmethod
+    def request_key(task, value):
+        if isinstance(value, str):
+            return task, normalize_input(value)
+        return task, json.dumps(value, sort_keys=True)
+
+    async def request(self, task, value):
+        """Returns the model's answer for one input; identical concurrent requests share one answer."""
+        self.requests += 1
+        key = self.request_key(task, value)
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            metrics.inc("llm_requests_coalesced_total", task=task)
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        self._enqueue(task, value, future)
+        return await asyncio.shield(future)
+
+    def _enqueue(self, task, value, future):
+        pending = self._pending[task]
+        pending.append((value, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(task)
+        elif task not in self._flush_handles:
+            self._flush_handles[task] = asyncio.get_running_loop().call_later(self.batch_window, self._flush, task)
+
+    def _flush(self, task):
+        handle = self._flush_handles.pop(task, None)
+        if handle is not None:
+            handle.cancel()
+        batch, self._pending[task] = self._pending[task], []
+        if batch:
+            asyncio.ensure_future(self._call(task, batch))
+
+    async def _call(self, task, batch):
+        if self._call_slots is None:
+            self._call_slots = asyncio.Semaphore(self.max_concurrent_calls)
+        inputs = [value for value, _ in batch]
+        try:
+            async with self._call_slots:
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire()
+                self.model_calls += 1
+                self.model_inputs += len(inputs)
+                metrics.inc("llm_model_calls_total", task=task)
+                metrics.inc("llm_model_inputs_total", len(inputs), task=task)
+                results = await self.backend.complete(task, inputs)
+        except Exception as e:
+            logger.warning("Model call for %d %s inputs failed: %s", len(inputs), task, e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(ModelBackendError(str(e)))
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+            return self._loop
+
+    def request_sync(self, task, value, timeout=None):
+        """Blocking request for synchronous callers, e.g. the pipeline's ingredient workers."""
+        future = asyncio.run_coroutine_threadsafe(self.request(task, value), self._get_loop())
+        return future.result(timeout)
+
+    def close(self):
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.backend.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "model_calls": self.model_calls,
+            "model_inputs": self.model_inputs,
+            "average_batch_size": self.model_inputs / self.model_calls if self.model_calls else 0.0
+        }
+
+class AsyncLLMHelperAgent:
+    """
+    LLMHelperAgent interface on top of an AsyncLLMClient, for the pipeline. Label context
+    extraction stays local; failed model calls are returned as {"error": ...} results.
+    """
+
+    def __init__(self, client, timeout=60.0, agent=None):
+        self.client = client
+        self.timeout = timeout
+        self.agent = agent or LLMHelperAgent()
+
+    def _request(self, task, value):
+        try:
+            return self.client.request_sync(task, value, self.timeout)
+        except Exception as e:
+            return {"error": f"Model request failed: {e!r}"}
+
+    def extract_context(self, text):
+        return self.agent.extract_context(text)
+
+    def classify_ingredient(self, ingredient_name):
+        return self._request("classify", ingredient_name)
+
+    def normalize_ingredient(self, ingredient_name):
+        return self._request("normalize", ingredient_name)
+
+    def generate_explanation(self, compliance_data):
+        return self._request("explain", compliance_data)
+
+class FakeModelServer:
+    """
+    Local model server for tests and benchmarks, speaking the HTTPModelBackend protocol.
+    Every batch takes `latency` seconds plus `latency_per_input` per input, and the server
+    counts the calls and inputs it receives.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, latency_per_input=0.0):
+        self.agent = LLMHelperAgent()
+        self.latency = latency
+        self.latency_per_input = latency_per_input
+        self.calls = 0
+        self.inputs = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/batch"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    task, inputs = request["task"], request["inputs"]
+                except (ValueError, KeyError, TypeError) as e:
+                    return self._send(400, {"error": f"Invalid request: {e}"})
+                with server._lock:
+                    server.calls += 1
+                    server.inputs += len(inputs)
+                time.sleep(server.latency + server.latency_per_input * len(inputs))
+                self._send(200, {"results": [answer(server.agent, task, value) for value in inputs]})
+
+            def _send(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("Fake model server: " + format, *args)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-model-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the fake model server.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per model call")
+    parser.add_argument("--latency-per-input", type=float, default=0.0, help="Additional seconds per input of a call")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    fake_server = FakeModelServer(port=args.port, latency=args.latency, latency_per_input=args.latency_per_input)
+    print(f"Fake model server listening on {fake_server.url}")
+    fake_server.serve_forever()
@@ -1,88 +1,86 @@
 import sys
 import json
-import subprocess
-import base64
+import logging
+import argparse
 
-def run_agent(agent_name, args):
-    command = ["python3", f"/home/student_01_ab8595ac0887/hackathon_project/{agent_name}"] + args
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
-    if process.returncode != 0:
-        raise Exception(f"Error executing {agent_name}: {stderr.decode('utf-8')}")
-    try:
-        return json.loads(stdout.decode('utf-8'))
-    except json.JSONDecodeError:
-        raise Exception(f"Invalid JSON output from {agent_name}: {stdout.decode('utf-8')}")
-
-def main(text_block):
-    # Step 1: Extract context from text
-    context_data = run_agent("llm_helper.py", ["extract_context", text_block])
-    if "error" in context_data:
-        print(json.dumps({"error": context_data["error"]}))
-        return
-    
-    food_category = context_data.get("food_category", "Unknown")
-    ingredients = context_data.get("ingredients", [])
-    
-    results = []
-    for item in ingredients:
-        ingredient = item["name"]
-        concentration = item["concentration"]
-        final_result = {"ingredient": ingredient}
-        try:
-            # Step 2: Classify ingredient
-            classification_data = run_agent("llm_helper.py", ["classify", ingredient])
-            if "error" in classification_data:
-                raise Exception(classification_data["error"])
-            is_additive = classification_data["is_additive"]
-            final_result["is_additive"] = is_additive
-
-            if is_additive:
-                # Step 3: Normalize ingredient name
-                normalized_data = run_agent("llm_helper.py", ["normalize", ingredient])
-                if "error" in normalized_data:
-                    raise Exception(normalized_data["error"])
-                normalized_ingredient = normalized_data["normalized_ingredient"]
-                final_result["normalized_ingredient"] = normalized_ingredient
-
-                # Step 4: Evaluate compliance
-                evaluation_result = run_agent("evaluator_agent.py", [normalized_ingredient, concentration, food_category])
-                if "error" in evaluation_result:
-                    raise Exception(evaluation_result["error"])
-
-                # Step 5: Judge the result
-                encoded_eval = base64.b64encode(json.dumps(evaluation_result).encode('utf-8')).decode('utf-8')
-                judged_result = run_agent("judge_agent.py", [encoded_eval])
-                if "error" in judged_result:
-                    raise Exception(judged_result["error"])
+from pipeline import create_pipeline
+from llm_cache import LLMCache, SQLiteStore, warm_from_registry
+from additive_registry import get_registry
+from llm_client import AsyncLLMClient, HTTPModelBackend
+from telemetry import start_trace, metrics
 
-                # Step 6: Generate explanation
-                encoded_judged = base64.b64encode(json.dumps(judged_result).encode('utf-8')).decode('utf-8')
-                explanation = run_agent("llm_helper.py", ["explain", encoded_judged])
-                if "error" in explanation:
-                    raise Exception(explanation["error"])
-                
-                final_result.update(judged_result[0])
-                final_result.update(explanation)
-            else:
-                final_result["status"] = "Not an additive"
-                final_result["reason"] = "This ingredient is not classified as a food additive."
-                final_result["regulation_reference"] = "N/A"
+def build_llm_cache(cache_file=None, warm=False):
+    """Creates the LLM helper cache, persisted to `cache_file` when given and optionally warmed from the registry."""
+    cache = LLMCache(store=SQLiteStore(cache_file) if cache_file else None)
+    if warm:
+        warm_from_registry(cache, get_registry())
+    return cache
 
-        except Exception as e:
-            final_result["error"] = str(e)
-            
-        results.append(final_result)
-
-    final_output = {
-        "food_category": food_category,
-        "results": results
-    }
+def main(text_block, use_subprocess=False, max_workers=1, timeout=None, llm_cache=None, trace_file=None, llm_client=None):
+    pipeline = create_pipeline(use_subprocess=use_subprocess, max_workers=max_workers, timeout=timeout, llm_cache=llm_cache, llm_client=llm_client)
+    try:
+        with start_trace("main") as trace:
+            final_output = pipeline.run(text_block)
+    finally:
+        pipeline.close()
+    if trace_file:
+        trace.dump(trace_file)
+    if "error" in final_output:
+        print(json.dumps({"error": final_output["error"]}))
+        return
     print(json.dumps(final_output, indent=2))
 
+def main_products(products_file, use_subprocess=False, max_workers=1, timeout=None, llm_cache=None, trace_file=None, llm_client=None):
+    """Evaluates a JSON file holding a list of {"food_category": ..., "ingredients": [...]} products."""
+    with open(products_file, 'r') as f:
+        products = json.load(f)
+    pipeline = create_pipeline(use_subprocess=use_subprocess, max_workers=max_workers, timeout=timeout, llm_cache=llm_cache, llm_client=llm_client)
+    try:
+        with start_trace("main_products") as trace:
+            results = pipeline.evaluate_products(products)
+    finally:
+        pipeline.close()
+    if trace_file:
+        trace.dump(trace_file)
+    print(json.dumps(results, indent=2))
+
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
-        text_block = sys.argv[1]
-        main(text_block)
+    parser = argparse.ArgumentParser(description="Evaluate the additives of a product label for EU compliance.")
+    parser.add_argument("text_block", nargs="?", help="Label text to evaluate")
+    parser.add_argument("--products", metavar="FILE",
+                        help="Evaluate a JSON list of products (food_category plus ingredients) instead of a label")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run every agent step in its own Python process (original mode, useful for benchmarking)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of ingredients processed concurrently (default: 1, sequential)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds an ingredient may take once started before it is reported as timed out")
+    parser.add_argument("--cache-file", metavar="PATH",
+                        help="SQLite file that persists LLM helper results across runs")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Pre-populate the LLM helper cache with the additives of the registry")
+    parser.add_argument("--model-server", metavar="URL",
+                        help="Send LLM helper calls to a model server (e.g. llm_client.py's fake server), batched across ingredients")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write the per-stage timings of this run as JSON to FILE")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Write the stage latency histograms and counters in the Prometheus text format to FILE")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Verbosity of the diagnostics written to stderr (default: WARNING)")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, stream=sys.stderr)
+
+    options = {"use_subprocess": args.subprocess, "max_workers": args.workers, "timeout": args.timeout, "trace_file": args.trace}
+    if not args.subprocess:
+        options["llm_cache"] = build_llm_cache(args.cache_file, args.warm_cache)
+        if args.model_server:
+            options["llm_client"] = AsyncLLMClient(HTTPModelBackend(args.model_server))
+    if args.products:
+        main_products(args.products, **options)
+    elif args.text_block:
+        main(args.text_block, **options)
     else:
         print(json.dumps({"error": "No text block provided"}))
+    if args.metrics:
+        with open(args.metrics, 'w') as f:
+            f.write(metrics.render_prometheus())
@@ -1,114 +1,160 @@
-import subprocess
+import argparse
+import contextvars
 import json
 import sys
-import re
-from default_api import google_web_search
+from concurrent.futures import ThreadPoolExecutor
 
-def search_online_for_regulation(ingredient, food_product):
-    """Searches online for EU regulations regarding the ingredient."""
-    for attempt in range(3):
-        try:
-            query = f"EU regulation for {ingredient} in {food_product}"
-            search_results = google_web_search(query=query)
-            if search_results and search_results.get("google_web_search_response", {}).get("output"):
-                # Naive parsing of search results. This should be improved with more sophisticated NLP techniques.
-                output = search_results.get("google_web_search_response", {}).get("output")
-                max_level_match = re.search(r'(\d+\.?\d*)\s*mg/kg', output)
-                if max_level_match:
-                    return {"max_level": f"{max_level_match.group(1)} mg/kg"}
-        except Exception:
-            pass  # Ignore exceptions and retry
-    return None
+from additive_registry import get_registry
+from evaluator_agent import evaluate_compliance
+from judge_agent import judge_evaluation
+from output_agent import format_output
+from query_parser import parse_query, parse_queries
+from regulation_fetcher import get_regulation_lookup, set_regulation_lookup, RegulationLookup, StubFetcher
+from telemetry import span, start_trace
 
-def orchestrate_evaluation(query):
-    """
-    Orchestrates the evaluation of a food additive compliance query.
+# Questions evaluated at the same time; online lookups dominate, so threads overlap their waiting
+MAX_WORKERS = 4
 
-    Args:
-        query: The user query (e.g., "Can I use E220 in dried apricots at 2500 mg/kg?").
-
-    Returns:
-        A formatted string with the evaluation result.
+def search_online_for_regulation(ingredient, food_product):
     """
-    # Orchestrator Agent: Extract structured input
-    try:
-        parts = query.split(" at ")
-        concentration_part = parts[1].strip().rstrip('?')
-        # Handle cases like "50 mg/L"
-        concentration_parts = concentration_part.split(" ")
-        concentration = f"{concentration_parts[0]} {concentration_parts[1]}"
-
-        parts = parts[0].split(" in ")
-        food_product = parts[1].strip()
-        ingredient = parts[0].replace("Can I use", "").strip()
+    Searches online for EU regulations regarding the ingredient.
+    Answers, including misses, are cached, so each ingredient is only searched once per cache lifetime.
+    """
+    with span("online_search", ingredient=ingredient):
+        return get_regulation_lookup().lookup_sync(ingredient, food_product)
 
-    except (ValueError, IndexError) as e:
-        return f"Error parsing query: {e}. Please use the format 'Can I use [Ingredient] in [Food Product] at [Concentration] [Unit]?'"
+def evaluate_query(parsed_query, registry=None):
+    """
+    Evaluates and judges one parsed question in-process, falling back to an online lookup
+    for ingredients that are not in the local data. Returns the judged results or {"error": ...}.
+    """
+    ingredient, food_product, concentration = parsed_query.ingredient, parsed_query.food_product, parsed_query.concentration
 
     # First attempt to evaluate with local data
-    evaluator_process = subprocess.Popen(
-        ['python3', '/home/student_01_ab8595ac0887/hackathon_project/evaluator_agent.py', ingredient, concentration, food_product],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    evaluator_stdout, evaluator_stderr = evaluator_process.communicate()
-
-    if evaluator_process.returncode != 0:
-        return f"Error executing evaluator agent: {evaluator_stderr.decode('utf-8')}"
-
-    evaluator_result = json.loads(evaluator_stdout.decode('utf-8'))
+    with span("evaluate", ingredient=ingredient):
+        evaluator_result = evaluate_compliance(ingredient, concentration, food_product, registry=registry)
 
     # If ingredient not found, search online
     if isinstance(evaluator_result, dict) and "error" in evaluator_result and "not found in the local" in evaluator_result["error"]:
         online_regulation = search_online_for_regulation(ingredient, food_product)
-        if online_regulation:
-            evaluator_process = subprocess.Popen(
-                ['python3', '/home/student_01_ab8595ac0887/hackathon_project/evaluator_agent.py', ingredient, concentration, food_product, json.dumps(online_regulation)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            evaluator_stdout, evaluator_stderr = evaluator_process.communicate()
-
-            if evaluator_process.returncode != 0:
-                return f"Error executing evaluator agent after online search: {evaluator_stderr.decode('utf-8')}"
-            
-            evaluator_result = json.loads(evaluator_stdout.decode('utf-8'))
-        else:
-            return f"Ingredient '{ingredient}' not found in the local food additives database or online. Escalating to human reviewer."
+        if not online_regulation:
+            return {"error": f"Ingredient '{ingredient}' not found in the local food additives database or online. Escalating to human reviewer."}
+        with span("evaluate", ingredient=ingredient):
+            evaluator_result = evaluate_compliance(ingredient, concentration, food_product, online_regulation)
 
     # Judge Agent
-    judge_process = subprocess.Popen(
-        ['python3', '/home/student_01_ab8595ac0887/hackathon_project/judge_agent.py', json.dumps(evaluator_result)],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    judge_stdout, judge_stderr = judge_process.communicate()
+    with span("judge", ingredient=ingredient):
+        judged_result = judge_evaluation(evaluator_result)
+    if isinstance(judged_result, dict) and 'error' in judged_result:
+        return {"error": f"Evaluation failed. Error: {judged_result['error']}. Escalating to human reviewer."}
 
-    if judge_process.returncode != 0:
-        return f"Error executing judge agent: {judge_stderr.decode('utf-8')}"
+    if parsed_query.stated_range:
+        judged_result = [dict(result, reason=f"{result['reason']} The upper bound of the stated range {parsed_query.stated_range} was evaluated.")
+                         for result in judged_result]
+    return judged_result
 
-    judged_result = json.loads(judge_stdout.decode('utf-8'))
+def current_registry():
+    try:
+        return get_registry()
+    except (OSError, ValueError):
+        # evaluate_compliance reports the missing or broken data file per question
+        return None
 
-    if isinstance(judged_result, dict) and 'error' in judged_result:
-        return f"Evaluation failed. Error: {judged_result['error']}. Escalating to human reviewer."
+def query_outcome(future):
+    """Returns the result of an evaluate_query future, or {"error": ...} if it raised."""
+    try:
+        return future.result()
+    except Exception as e:
+        return {"error": f"Evaluation failed. Error: {e}. Escalating to human reviewer."}
+
+def orchestrate_queries(queries, max_workers=MAX_WORKERS):
+    """
+    Evaluates a list of questions as one in-process batch and returns a single table.
+
+    Every ingredient of every question gets its own row, in question order. Questions
+    that cannot be parsed or evaluated get an error row instead of failing the batch.
+    """
+    items = parse_queries(queries)
+    registry = current_registry()
+    parsed_queries = [item for item in items if not isinstance(item, dict)]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query") as executor:
+        # Each worker runs in a copy of the caller's context so its spans land in the caller's trace
+        futures = [executor.submit(contextvars.copy_context().run, evaluate_query, item, registry) for item in parsed_queries]
+        outcomes = iter([query_outcome(future) for future in futures])
+
+    rows = []
+    for item in items:
+        if isinstance(item, dict):
+            rows.append({"ingredient": item["query"], "status": "Error", "reason": item["error"], "regulation_reference": "N/A"})
+            continue
+        outcome = next(outcomes)
+        if isinstance(outcome, dict):
+            rows.append({"ingredient": item.ingredient, "status": "Error", "reason": outcome["error"], "regulation_reference": "N/A"})
+        else:
+            rows.extend(outcome)
 
     # Output Agent
-    output_process = subprocess.Popen(
-        ['python3', '/home/student_01_ab8595ac0887/hackathon_project/output_agent.py', json.dumps(judged_result)],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    output_stdout, output_stderr = output_process.communicate()
+    with span("output"):
+        return format_output(rows)
 
-    if output_process.returncode != 0:
-        return f"Error executing output agent: {output_stderr.decode('utf-8')}"
+def orchestrate_evaluation(query):
+    """
+    Orchestrates the evaluation of a food additive compliance query.
 
-    return output_stdout.decode('utf-8')
+    Args:
+        query: The user query (e.g., "Can I use E220 in dried apricots at 2500 mg/kg?").
+               Several ingredients and concentrations may be given, e.g.
+               "Can I use E211 and E202 in beverages at 150 mg/L and 300 mg/L?".
+
+    Returns:
+        A formatted string with the evaluation result.
+    """
+    # Orchestrator Agent: Extract structured input
+    parsed_queries = parse_query(query)
+    if isinstance(parsed_queries, dict):
+        return parsed_queries["error"]
+    if len(parsed_queries) > 1:
+        return orchestrate_queries([query])
+
+    judged_result = evaluate_query(parsed_queries[0], current_registry())
+    if isinstance(judged_result, dict):
+        return judged_result["error"]
+
+    # Output Agent
+    with span("output"):
+        return format_output(judged_result)
+
+def read_queries(path):
+    """Reads one question per line from a file, or from stdin for '-'."""
+    if path == "-":
+        return sys.stdin.read().splitlines()
+    with open(path, 'r') as f:
+        return f.read().splitlines()
 
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
-        user_query = ' '.join(sys.argv[1:])
-        result = orchestrate_evaluation(user_query)
-        print(result)
-    else:
-        print("Usage: python orchestrator.py <user_query>")
+    parser = argparse.ArgumentParser(description="Answer 'Can I use [Ingredient] in [Food Product] at [Concentration] [Unit]?' questions.")
+    parser.add_argument("query", nargs="*", help="The question to evaluate")
+    parser.add_argument("--file", metavar="FILE", help="Evaluate a list of questions, one per line (- for stdin), as one table")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help=f"Questions evaluated at the same time (default: {MAX_WORKERS})")
+    parser.add_argument("--trace", metavar="FILE", help="Write the per-stage timings of this run as JSON to FILE")
+    parser.add_argument("--offline-limits", metavar="FILE",
+                        help="Answer ingredients missing from the local data from a JSON file of {ingredient: max_level} instead of searching online")
+    args = parser.parse_args()
+
+    if not args.query and not args.file:
+        print("Usage: python orchestrator.py [--trace FILE] <user_query> | --file <questions.txt>")
+        sys.exit(0)
+
+    if args.offline_limits:
+        with open(args.offline_limits, 'r') as f:
+            set_regulation_lookup(RegulationLookup(StubFetcher(json.load(f))))
+
+    with start_trace("orchestrator") as trace:
+        if args.file:
+            result = orchestrate_queries(read_queries(args.file), args.workers)
+        else:
+            result = orchestrate_evaluation(' '.join(args.query))
+    if args.trace:
+        trace.dump(args.trace)
+    print(result)
@@ -8,13 +8,13 @@ def format_output(judged_output):
     Formats the judged evaluation into a structured report.
 
     Args:
-        judged_output: The JSON string output from the judge agent.
+        judged_output: The JSON string output from the judge agent, or the already decoded result.
 
     Returns:
         A formatted string with the evaluation report.
     """
     try:
-        evaluation = json.loads(judged_output)
+        evaluation = json.loads(judged_output) if isinstance(judged_output, (str, bytes)) else judged_output
 
         if isinstance(evaluation, dict) and 'error' in evaluation:
             return f"Error in evaluation: {evaluation['error']}"
@@ -0,0 +1,71 @@
+"""
+Answers "which additives are allowed in this food?" from the registry's category index.
+
+A food category is given as an Annex II category_id (e.g. '14.1.4') or as a food product
+description, which is resolved like in the evaluator. Rules listed for a parent category
+apply to its subcategories, so the additives of 14.1.4 include those permitted in 14.1
+and 14. The result can be filtered by technological function, e.g. 'Preservative'.
+"""
+import json
+import sys
+
+from additive_registry import get_registry, normalize_key
+from compliance_rules import LimitKind
+from fuzzy_matcher import DEFAULT_THRESHOLD
+
+# Not permitted entries, and entries whose maximum level could not be read, do not allow an additive
+EXCLUDED_KINDS = (LimitKind.NOT_PERMITTED, LimitKind.INVALID)
+
+def has_function(rule, function):
+    """Returns True if the rule's function, e.g. 'Preservative' or 'Antioxidant, Preservative', includes `function`."""
+    if not rule.function:
+        return False
+    return normalize_key(function) in (normalize_key(part) for part in rule.function.replace(";", ",").split(","))
+
+def permitted_additives(food_category, function=None, include_subcategories=False, registry=None, match_threshold=DEFAULT_THRESHOLD):
+    """
+    Returns {"category_id", "food_category", "function", "additives": [...]} listing every
+    additive permitted in the food category, in data file order, or {"error": ...}.
+
+    Each additive entry holds the code, name, function, maximum level and the category_id the
+    rule is listed under, which is a parent category for inherited rules.
+    """
+    if registry is None:
+        try:
+            registry = get_registry()
+        except (OSError, ValueError) as e:
+            return {"error": f"The additive data could not be loaded: {e}"}
+
+    category_id = registry.find_category(food_category, match_threshold)
+    if category_id is None:
+        return {"error": f"Food category '{food_category}' not found in the local food additives database."}
+
+    additives = []
+    for rule in registry.rules_in_category(category_id, include_subcategories):
+        if rule.kind in EXCLUDED_KINDS or (function and not has_function(rule, function)):
+            continue
+        additives.append({
+            "code": rule.code,
+            "name": rule.name,
+            "function": rule.function,
+            "max_level": rule.max_level,
+            "category_id": rule.category_id,
+            "category_name": rule.category_name,
+            "inherited": rule.category_id != category_id and not rule.category_id.startswith(category_id + "."),
+            "regulation": rule.regulation
+        })
+
+    return {
+        "category_id": category_id,
+        "food_category": food_category,
+        "function": function,
+        "additives": additives
+    }
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python permitted_additives.py <category_id or food_product> [<function>] [--include-subcategories]")
+    else:
+        arguments = [argument for argument in sys.argv[1:] if argument != "--include-subcategories"]
+        function = arguments[1] if len(arguments) > 1 else None
+        print(json.dumps(permitted_additives(arguments[0], function, "--include-subcategories" in sys.argv), indent=2))
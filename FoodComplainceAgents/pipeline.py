@@ -0,0 +1,406 @@
+import json
+import subprocess
+import base64
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from llm_helper import LLMHelperAgent
+from llm_cache import CachedLLMHelperAgent, LLMCache
+from llm_client import AsyncLLMHelperAgent
+from evaluator_agent import evaluate_compliance
+from additive_registry import get_registry
+from judge_agent import judge_evaluation
+from label_parser import parse_label
+from preclassifier import get_preclassifier, FastPathStats
+from telemetry import span, metrics
+from verdict_cache import VerdictCache
+
+AGENTS_DIR = "/home/student_01_ab8595ac0887/hackathon_project"
+
+def run_agent(agent_name, args):
+    command = ["python3", f"{AGENTS_DIR}/{agent_name}"] + args
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"Error executing {agent_name}: {stderr.decode('utf-8')}")
+    try:
+        return json.loads(stdout.decode('utf-8'))
+    except json.JSONDecodeError:
+        raise Exception(f"Invalid JSON output from {agent_name}: {stdout.decode('utf-8')}")
+
+def encode_payload(data):
+    """Base64-encodes a JSON payload for the agents' command line interface."""
+    return base64.b64encode(json.dumps(data).encode('utf-8')).decode('utf-8')
+
+class InProcessAgents:
+    """Calls the agents as Python functions inside the current interpreter."""
+
+    def __init__(self, llm_helper=None):
+        self.llm_helper = llm_helper or LLMHelperAgent()
+
+    def extract_context(self, text_block):
+        return self.llm_helper.extract_context(text_block)
+
+    def classify(self, ingredient):
+        return self.llm_helper.classify_ingredient(ingredient)
+
+    def normalize(self, ingredient):
+        return self.llm_helper.normalize_ingredient(ingredient)
+
+    def resolve_category(self, food_category, registry=None):
+        try:
+            return (registry if registry is not None else get_registry()).resolve_category(food_category)
+        except (OSError, ValueError):
+            # The evaluator reports the missing or broken data file per ingredient
+            return None
+
+    def evaluate(self, ingredient, concentration, food_category, category_id=None, registry=None):
+        return evaluate_compliance(ingredient, concentration, food_category, registry=registry, category_id=category_id)
+
+    def judge(self, evaluation_result):
+        return judge_evaluation(evaluation_result)
+
+    def explain(self, judged_result):
+        return self.llm_helper.generate_explanation(judged_result)
+
+class SubprocessAgents:
+    """Runs every agent step in its own Python interpreter (the original mode)."""
+
+    def extract_context(self, text_block):
+        return run_agent("llm_helper.py", ["extract_context", text_block])
+
+    def classify(self, ingredient):
+        return run_agent("llm_helper.py", ["classify", ingredient])
+
+    def normalize(self, ingredient):
+        return run_agent("llm_helper.py", ["normalize", ingredient])
+
+    def resolve_category(self, food_category, registry=None):
+        # The evaluator process resolves the category itself
+        return None
+
+    def evaluate(self, ingredient, concentration, food_category, category_id=None, registry=None):
+        # The evaluator process loads the current data file itself
+        return run_agent("evaluator_agent.py", [ingredient, concentration, food_category])
+
+    def judge(self, evaluation_result):
+        return run_agent("judge_agent.py", [encode_payload(evaluation_result)])
+
+    def explain(self, judged_result):
+        return run_agent("llm_helper.py", ["explain", encode_payload(judged_result)])
+
+class CompliancePipeline:
+    """
+    Runs the classify -> normalize -> evaluate -> judge -> explain chain for a label.
+
+    The same steps are used for both agent modes, so in-process and subprocess
+    runs produce identical results.
+    """
+
+    def __init__(self, agents=None, max_workers=1, timeout=None, fast_path=True, verdict_cache=None, parse_labels=True):
+        self.agents = agents or InProcessAgents()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.fast_path = fast_path
+        self.parse_labels = parse_labels
+        self.verdict_cache = verdict_cache
+        self.fast_path_stats = FastPathStats()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingredient")
+            return self._executor
+
+    def close(self):
+        """Shuts down the worker pool used for concurrent ingredients."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    @staticmethod
+    def current_registry():
+        """
+        Returns the registry in use, or None if the data file cannot be loaded.
+        A product is evaluated against the registry taken when it starts, even if the data is reloaded meanwhile.
+        """
+        try:
+            return get_registry()
+        except (OSError, ValueError):
+            return None
+
+    def extract_context(self, text_block):
+        """Extracts the food category and ingredients of a label, asking the LLM helper only for text the label parser cannot parse."""
+        if self.parse_labels:
+            with span("parse_label"):
+                context_data = parse_label(text_block)
+            metrics.inc("label_parser_total", result="parsed" if context_data is not None else "fallback")
+            if context_data is not None:
+                return context_data
+        with span("extract_context"):
+            return self.agents.extract_context(text_block)
+
+    def preclassify(self, ingredient, registry=None):
+        """Returns the E-number of an ingredient the registry recognizes on its own, or None."""
+        if not self.fast_path:
+            return None
+        registry = registry if registry is not None else self.current_registry()
+        if registry is None:
+            return None
+        with span("fast_path", ingredient=ingredient):
+            code, method = get_preclassifier(registry).resolve(ingredient)
+        self.fast_path_stats.record(method)
+        metrics.inc("fast_path_lookups_total", result="hit" if code else "miss")
+        return code
+
+    def normalize_ingredient(self, item, registry=None):
+        """Classifies and normalizes one ingredient, returning (final_result, normalized_ingredient)."""
+        ingredient = item["name"]
+        final_result = {"ingredient": ingredient}
+        try:
+            # Known additives are resolved from the registry without asking the LLM helper
+            code = self.preclassify(ingredient, registry)
+            if code is not None:
+                final_result["is_additive"] = True
+                final_result["normalized_ingredient"] = code
+                return final_result, code
+
+            # Step 2: Classify ingredient
+            with span("classify", ingredient=ingredient):
+                classification_data = self.agents.classify(ingredient)
+            if "error" in classification_data:
+                raise Exception(classification_data["error"])
+            is_additive = classification_data["is_additive"]
+            final_result["is_additive"] = is_additive
+
+            if not is_additive:
+                final_result["status"] = "Not an additive"
+                final_result["reason"] = "This ingredient is not classified as a food additive."
+                final_result["regulation_reference"] = "N/A"
+                return final_result, None
+
+            # Step 3: Normalize ingredient name
+            with span("normalize", ingredient=ingredient):
+                normalized_data = self.agents.normalize(ingredient)
+            if "error" in normalized_data:
+                raise Exception(normalized_data["error"])
+            normalized_ingredient = normalized_data["normalized_ingredient"]
+            final_result["normalized_ingredient"] = normalized_ingredient
+            return final_result, normalized_ingredient
+
+        except Exception as e:
+            final_result["error"] = str(e)
+            return final_result, None
+
+    def cached_verdict(self, normalized_ingredient, concentration, category_id, registry=None):
+        """Returns (key, verdict) from the verdict cache; key is None when the evaluation cannot be cached."""
+        if self.verdict_cache is None or category_id is None:
+            return None, None
+        registry = registry if registry is not None else self.current_registry()
+        if registry is None:
+            return None, None
+        key = self.verdict_cache.make_key(registry, normalized_ingredient, category_id, concentration)
+        if key is None:
+            return None, None
+        return key, self.verdict_cache.get(key, concentration)
+
+    def assess_ingredient(self, final_result, normalized_ingredient, concentration, food_category, category_id=None, registry=None):
+        """Evaluates, judges and explains a normalized additive, completing its final_result."""
+        try:
+            # Identical questions are answered from the verdict cache
+            key, verdict = self.cached_verdict(normalized_ingredient, concentration, category_id, registry)
+            if verdict is not None:
+                final_result.update(verdict)
+                return final_result
+
+            # Step 4: Evaluate compliance
+            with span("evaluate", ingredient=normalized_ingredient):
+                evaluation_result = self.agents.evaluate(normalized_ingredient, concentration, food_category, category_id, registry)
+            if "error" in evaluation_result:
+                raise Exception(evaluation_result["error"])
+
+            # Step 5: Judge the result
+            with span("judge", ingredient=normalized_ingredient):
+                judged_result = self.agents.judge(evaluation_result)
+            if "error" in judged_result:
+                raise Exception(judged_result["error"])
+
+            # Step 6: Generate explanation
+            with span("explain", ingredient=normalized_ingredient):
+                explanation = self.agents.explain(judged_result)
+            if "error" in explanation:
+                raise Exception(explanation["error"])
+
+            verdict = {**judged_result[0], **explanation}
+            if key is not None:
+                self.verdict_cache.set(key, concentration, verdict)
+            final_result.update(verdict)
+
+        except Exception as e:
+            final_result["error"] = str(e)
+        return final_result
+
+    def process_ingredient(self, item, food_category, category_id=None, registry=None):
+        final_result, normalized_ingredient = self.normalize_ingredient(item, registry)
+        if normalized_ingredient is None:
+            return final_result
+        return self.assess_ingredient(final_result, normalized_ingredient, item.get("concentration", "N/A"), food_category, category_id, registry)
+
+    def evaluate_product(self, food_category, ingredients, registry=None):
+        """
+        Evaluates every ingredient of one product against its food category.
+
+        The category is resolved once and all ingredients are classified and
+        normalized in one pass before the additives are evaluated. Results keep
+        the input order, and an error in one ingredient only affects its own result.
+        """
+        registry = registry if registry is not None else self.current_registry()
+        category_id = self.agents.resolve_category(food_category, registry)
+        if self._use_executor(ingredients):
+            results = self._process_concurrently(ingredients, food_category, category_id, registry)
+        else:
+            normalized = [self.normalize_ingredient(item, registry) for item in ingredients]
+
+            results = []
+            for item, (final_result, normalized_ingredient) in zip(ingredients, normalized):
+                if normalized_ingredient is not None:
+                    final_result = self.assess_ingredient(final_result, normalized_ingredient, item.get("concentration", "N/A"), food_category, category_id, registry)
+                results.append(final_result)
+        return {
+            "food_category": food_category,
+            "results": results
+        }
+
+    def _use_executor(self, ingredients):
+        # The timeout is only enforced on the worker pool, so it is used for every product when one is set
+        return self.timeout is not None or (self.max_workers > 1 and len(ingredients) > 1)
+
+    def _process_concurrently(self, ingredients, food_category, category_id, registry=None):
+        """Runs the per-ingredient chain on the worker pool and returns the results in input order."""
+        results = [None] * len(ingredients)
+        for position, final_result in self._iter_concurrently(ingredients, food_category, category_id, registry):
+            results[position] = final_result
+        return results
+
+    def _iter_concurrently(self, ingredients, food_category, category_id, registry=None):
+        """
+        Runs the per-ingredient chain on the worker pool, at most `max_workers` at a time,
+        yielding (position, final_result) pairs as ingredients complete.
+
+        `timeout` is counted from the moment an ingredient starts running; an
+        ingredient that exceeds it gets an error result and the rest are unaffected.
+        """
+        executor = self._get_executor()
+        started_at = {}
+
+        def run(position, item):
+            started_at[position] = time.monotonic()
+            return self.process_ingredient(item, food_category, category_id, registry)
+
+        # Each worker runs in a copy of the caller's context so its spans land in the caller's trace
+        pending = {executor.submit(contextvars.copy_context().run, run, position, item): position
+                   for position, item in enumerate(ingredients)}
+        while pending:
+            done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = pending.pop(future)
+                try:
+                    yield position, future.result()
+                except Exception as e:
+                    yield position, {"ingredient": ingredients[position].get("name"), "error": str(e)}
+
+            if self.timeout is None:
+                continue
+            now = time.monotonic()
+            for future, position in list(pending.items()):
+                if position in started_at and now - started_at[position] > self.timeout:
+                    # The worker thread cannot be interrupted; its late result is discarded
+                    del pending[future]
+                    yield position, {"ingredient": ingredients[position]["name"], "error": f"Timed out after {self.timeout} seconds."}
+
+    def iter_product(self, food_category, ingredients, registry=None):
+        """Yields (position, final_result) for each ingredient of a product as soon as it is complete."""
+        registry = registry if registry is not None else self.current_registry()
+        category_id = self.agents.resolve_category(food_category, registry)
+        if self._use_executor(ingredients):
+            yield from self._iter_concurrently(ingredients, food_category, category_id, registry)
+        else:
+            for position, item in enumerate(ingredients):
+                yield position, self.process_ingredient(item, food_category, category_id, registry)
+
+    def evaluate_products(self, products, registry=None):
+        """Evaluates many {"food_category": ..., "ingredients": [...]} products, in input order."""
+        registry = registry if registry is not None else self.current_registry()
+        return [self.evaluate_product(product.get("food_category", "Unknown"), product.get("ingredients", []), registry)
+                for product in products]
+
+    def run(self, text_block, registry=None):
+        # Step 1: Extract context from text
+        context_data = self.extract_context(text_block)
+        if "error" in context_data:
+            return {"error": context_data["error"]}
+
+        return self.evaluate_product(context_data.get("food_category", "Unknown"), context_data.get("ingredients", []), registry)
+
+    def iter_run(self, text_block, registry=None):
+        """
+        Streams the evaluation of a label as event records: a "context" record with the
+        food category, one "result" record per ingredient as soon as it has been judged
+        and explained, and a closing "summary" record. Extraction failures yield a
+        single "error" record. The summary names the version of the additive data used.
+        """
+        started = time.monotonic()
+        registry = registry if registry is not None else self.current_registry()
+        context_data = self.extract_context(text_block)
+        if "error" in context_data:
+            yield {"type": "error", "error": context_data["error"]}
+            return
+
+        food_category = context_data.get("food_category", "Unknown")
+        ingredients = context_data.get("ingredients", [])
+        yield {"type": "context", "food_category": food_category, "ingredient_count": len(ingredients)}
+
+        status_counts = {}
+        errors = 0
+        for position, final_result in self.iter_product(food_category, ingredients, registry):
+            if "error" in final_result:
+                errors += 1
+            else:
+                status_counts[final_result["status"]] = status_counts.get(final_result["status"], 0) + 1
+            yield {"type": "result", "index": position, "result": final_result}
+
+        yield {
+            "type": "summary",
+            "food_category": food_category,
+            "ingredient_count": len(ingredients),
+            "status_counts": status_counts,
+            "errors": errors,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "data_version": registry.version if registry is not None else None
+        }
+
+def create_pipeline(use_subprocess=False, max_workers=1, timeout=None, llm_cache=None, fast_path=True, verdict_cache=None, parse_labels=True,
+                    llm_client=None):
+    """
+    Builds a pipeline that runs the agents in-process or one subprocess per step.
+    With max_workers > 1 the ingredients of a product are processed concurrently.
+    In-process LLM helper calls are memoized in `llm_cache` (a new in-memory LLMCache by default),
+    and complete verdicts in `verdict_cache` (a new VerdictCache by default).
+    With `fast_path`, ingredients the registry recognizes skip LLM classification and normalization,
+    and with `parse_labels`, labels in ingredient list form are parsed without the LLM helper.
+    With an `llm_client` (an AsyncLLMClient), LLM helper calls that miss the cache are sent to its
+    model backend, coalesced and batched with those of concurrent ingredients and requests.
+    """
+    if use_subprocess:
+        agents = SubprocessAgents()
+    else:
+        llm_helper = AsyncLLMHelperAgent(llm_client) if llm_client is not None else None
+        agents = InProcessAgents(CachedLLMHelperAgent(llm_helper, cache=llm_cache if llm_cache is not None else LLMCache()))
+        if verdict_cache is None:
+            verdict_cache = VerdictCache()
+    return CompliancePipeline(agents, max_workers=max_workers, timeout=timeout, fast_path=fast_path, verdict_cache=verdict_cache, parse_labels=parse_labels)
@@ -0,0 +1,90 @@
+import re
+import threading
+
+from additive_registry import additive_aliases, normalize_key
+
+E_NUMBER_IN_TEXT = re.compile(r'\bE\s?-?(\d{3,4}[a-z]?)\b', re.IGNORECASE)
+
+class AdditivePreclassifier:
+    """
+    Deterministic classifier built from the additive registry.
+
+    Resolves an ingredient string to an E-number without a model call when it
+    - contains an E-number that is in the registry, e.g. "Sodium Benzoate (E211)",
+    - is exactly a registered name or synonym, e.g. "potassium sorbate", or
+    - contains a registered name or synonym as whole words, e.g. "Colour: Sunset Yellow FCF".
+    Anything else is left to the LLM helper.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.codes_by_alias = {}
+        for additive in registry.additives:
+            code = additive.get("code")
+            if not code:
+                continue
+            for alias in additive_aliases(additive):
+                self.codes_by_alias.setdefault(normalize_key(alias), code)
+        # Longest names first, so "Sunset Yellow FCF" wins over a shorter synonym it contains
+        aliases = sorted(self.codes_by_alias, key=len, reverse=True)
+        self.alias_pattern = re.compile(r'(?<!\w)(' + '|'.join(re.escape(alias) for alias in aliases) + r')(?!\w)') if aliases else None
+
+    def resolve(self, ingredient):
+        """Returns (code, method) for a recognized additive, or (None, None)."""
+        for match in E_NUMBER_IN_TEXT.finditer(ingredient):
+            additive = self.registry.get_by_code(f"E{match.group(1)}")
+            if additive:
+                return additive["code"], "e_number"
+
+        key = normalize_key(ingredient)
+        code = self.codes_by_alias.get(key)
+        if code:
+            return code, "exact_name"
+
+        if self.alias_pattern is not None:
+            match = self.alias_pattern.search(key)
+            if match:
+                return self.codes_by_alias[match.group(1)], "name_in_text"
+        return None, None
+
+_build_lock = threading.Lock()
+
+def get_preclassifier(registry):
+    """
+    Returns the pre-classifier of a registry, building it on first use. It is kept on the
+    registry, so it is released together with a registry that has been replaced.
+    """
+    preclassifier = getattr(registry, "preclassifier", None)
+    if preclassifier is None:
+        with _build_lock:
+            preclassifier = getattr(registry, "preclassifier", None)
+            if preclassifier is None:
+                preclassifier = registry.preclassifier = AdditivePreclassifier(registry)
+    return preclassifier
+
+class FastPathStats:
+    """Counts how many ingredients were resolved by the pre-classifier instead of the LLM helper."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.by_method = {}
+
+    def record(self, method):
+        with self._lock:
+            if method is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.by_method[method] = self.by_method.get(method, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "by_method": dict(self.by_method)
+            }
@@ -0,0 +1,90 @@
+"""
+Parser for compliance questions such as
+
+    Can I use E220 in dried apricots at 1500 mg/kg?
+    Can I use E211 and E202 in beverages at 150 mg/L and 300 mg/L?
+    Can I use citric acid in soft drinks at 0,1–0,25%?
+
+A question names one or more ingredients, one food product and either one concentration
+for all ingredients or one per ingredient. Numbers are read as on labels (see label_parser):
+decimal commas are accepted and 1,000 groups thousands. For ranges the upper bound is
+evaluated, as that is the level the product may reach.
+"""
+import re
+import sys
+from typing import NamedTuple, Optional
+
+from label_parser import NUMBER, parse_number
+
+QUERY_PATTERN = re.compile(
+    r'^\s*(?:can\s+(?:i|we)\s+use\s+)?(?P<ingredients>.+?)\s+in\s+(?P<food_product>.+?)\s+at\s+(?P<concentrations>\d.*?)[\s?.!]*$',
+    re.IGNORECASE)
+CONCENTRATION_PATTERN = re.compile(
+    rf'(?P<low>{NUMBER})\s*(?:(?:-|–|—|to)\s*(?P<high>{NUMBER})\s*)?(?P<unit>%|ppm|mg/kg|mg/l|g/kg|g/l)',
+    re.IGNORECASE)
+# "and" only separates when it stands alone, not in names like Mono-and-di-glycerides-of-fatty-acids
+INGREDIENT_SEPARATOR = re.compile(r'\s*(?:,|;|&)\s*|\s+and\s+', re.IGNORECASE)
+UNITS = {"%": "%", "ppm": "mg/kg", "mg/kg": "mg/kg", "mg/l": "mg/L", "g/kg": "g/kg", "g/l": "g/L"}
+
+class ParsedQuery(NamedTuple):
+    """One ingredient x food product x concentration question, ready for evaluate_compliance."""
+    ingredient: str
+    food_product: str
+    concentration: str
+    query: str
+    stated_range: Optional[str] = None
+
+def format_number(value):
+    return f"{value:g}"
+
+def parse_concentrations(text):
+    """Returns one (concentration, stated_range) pair per concentration in the text, e.g. ('0.25 %', '0,1–0,25%')."""
+    concentrations = []
+    for match in CONCENTRATION_PATTERN.finditer(text):
+        value = parse_number(match.group("high") or match.group("low"))
+        unit = UNITS[match.group("unit").lower()]
+        stated_range = match.group(0).strip() if match.group("high") else None
+        concentrations.append((f"{format_number(value)} {unit}", stated_range))
+    return concentrations
+
+def parse_query(query):
+    """Parses one question into a list of ParsedQuery, or returns {"error": ...}."""
+    match = QUERY_PATTERN.match(query)
+    if not match:
+        return {"error": f"Error parsing query: '{query}'. Please use the format 'Can I use [Ingredient] in [Food Product] at [Concentration] [Unit]?'"}
+
+    ingredients = [name for name in INGREDIENT_SEPARATOR.split(match.group("ingredients")) if name]
+    food_product = match.group("food_product").strip()
+    concentrations = parse_concentrations(match.group("concentrations"))
+    if not concentrations:
+        return {"error": f"Error parsing query: no concentration with a unit (%, ppm, mg/kg, mg/L, g/kg, g/L) found in '{query}'."}
+    if len(concentrations) == 1:
+        concentrations = concentrations * len(ingredients)
+    if len(concentrations) != len(ingredients):
+        return {"error": f"Error parsing query: {len(ingredients)} ingredients but {len(concentrations)} concentrations in '{query}'."}
+
+    return [ParsedQuery(ingredient, food_product, concentration, query, stated_range)
+            for ingredient, (concentration, stated_range) in zip(ingredients, concentrations)]
+
+def parse_queries(queries):
+    """
+    Parses a list of questions into one list, in question order, holding a ParsedQuery per
+    ingredient and a {"query": ..., "error": ...} entry per question that could not be parsed.
+    """
+    parsed = []
+    for query in queries:
+        if not query.strip():
+            continue
+        result = parse_query(query)
+        if isinstance(result, dict):
+            parsed.append({"query": query, "error": result["error"]})
+        else:
+            parsed.extend(result)
+    return parsed
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python query_parser.py <query> [<query> ...]")
+    else:
+        for item in parse_queries(sys.argv[1:]):
+            print(item if isinstance(item, dict) else item._asdict())
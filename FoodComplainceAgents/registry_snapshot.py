@@ -0,0 +1,162 @@
+"""
+Compact, versioned snapshots of the indexed additive registry.
+
+A snapshot holds the fully built AdditiveRegistry (additives, compiled rules and all
+lookup indices) so that agents can skip parsing and indexing the JSON data file. The
+file layout is:
+
+    MAGIC (4 bytes) | header length (4 bytes, big endian) | JSON header | pickled registry
+
+The header records the format version, the SHA-256 of the code that compiles and indexes
+the rules, the size, modification time and SHA-256 of the source data file and the SHA-256
+of the payload. A snapshot is only used when it matches the current code and data file;
+otherwise the JSON file is loaded instead.
+
+The payload is a pickle, and unpickling runs code chosen by whoever wrote the file, while
+the SHA-256 fields only detect corruption. Snapshots are therefore only loaded when
+SNAPSHOT_KEY is set, in which case they are signed with an HMAC-SHA256 of the payload under
+that key and snapshots without a valid signature are ignored, or when
+TRUST_UNSIGNED_SNAPSHOTS=1 declares the data directory as trusted as the code itself.
+Otherwise the JSON file is always loaded.
+
+Usage:
+    python3 registry_snapshot.py build [data_file ...]
+    python3 registry_snapshot.py info <snapshot_file>
+"""
+import gc
+import hashlib
+import hmac
+import json
+import logging
+import os
+import pickle
+import struct
+import sys
+from functools import lru_cache
+
+import additive_registry
+import compliance_rules
+from additive_registry import AdditiveRegistry, DEFAULT_DATA_FILE
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FCAS"
+# Bumped whenever the pickled registry gains or changes indices. The version and checksums
+# do not make a snapshot safe to unpickle; only its origin (or SNAPSHOT_KEY) does
+FORMAT_VERSION = 3
+# When set, snapshots are signed and only snapshots signed with this key are unpickled
+SNAPSHOT_KEY = os.environ.get("SNAPSHOT_KEY")
+# Opt-in to loading unsigned snapshots, for data directories only trusted users can write to
+TRUST_UNSIGNED_SNAPSHOTS = os.environ.get("TRUST_UNSIGNED_SNAPSHOTS") == "1"
+# Modules whose code decides the contents of the pickled registry
+COMPILER_MODULES = (additive_registry, compliance_rules)
+
+def snapshot_path_for(json_file_path):
+    return f"{json_file_path}.snapshot"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@lru_cache(maxsize=1)
+def code_sha256():
+    """Returns the SHA-256 of the source of the modules that compile and index the rules."""
+    return hashlib.sha256("".join(file_sha256(module.__file__) for module in COMPILER_MODULES).encode()).hexdigest()
+
+def payload_hmac(payload):
+    return hmac.new(SNAPSHOT_KEY.encode('utf-8'), payload, hashlib.sha256).hexdigest()
+
+def build_snapshot(json_file_path, snapshot_path=None):
+    """Compiles a data file into a snapshot and returns the snapshot path."""
+    snapshot_path = snapshot_path or snapshot_path_for(json_file_path)
+    source_stat = os.stat(json_file_path)
+    registry = AdditiveRegistry.from_file(json_file_path)
+    payload = pickle.dumps(registry, protocol=pickle.HIGHEST_PROTOCOL)
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "code_sha256": code_sha256(),
+        "source_size": source_stat.st_size,
+        "source_mtime_ns": source_stat.st_mtime_ns,
+        "source_sha256": registry.version,
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+        "payload_hmac": payload_hmac(payload) if SNAPSHOT_KEY else None,
+        "additives": len(registry),
+        "rules": sum(len(rules) for rules in registry.rules_by_additive)
+    }).encode('utf-8')
+
+    temporary_path = f"{snapshot_path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack(">I", len(header)))
+        f.write(header)
+        f.write(payload)
+    os.replace(temporary_path, snapshot_path)
+    return snapshot_path
+
+def read_header(snapshot_file):
+    if snapshot_file.read(4) != MAGIC:
+        raise ValueError("Not a registry snapshot")
+    (header_length,) = struct.unpack(">I", snapshot_file.read(4))
+    return json.loads(snapshot_file.read(header_length))
+
+def is_fresh(header, json_file_path):
+    """Checks that a snapshot header matches the current data file."""
+    if header.get("format_version") != FORMAT_VERSION or header.get("code_sha256") != code_sha256():
+        return False
+    source_stat = os.stat(json_file_path)
+    if source_stat.st_size != header.get("source_size"):
+        return False
+    if source_stat.st_mtime_ns == header.get("source_mtime_ns"):
+        return True
+    # Same size but touched: only trust the snapshot if the content is unchanged
+    return file_sha256(json_file_path) == header.get("source_sha256")
+
+def load_snapshot(snapshot_path, json_file_path):
+    """
+    Returns the registry stored in a snapshot, or None if it is missing, stale, corrupt or
+    not trusted (see SNAPSHOT_KEY and TRUST_UNSIGNED_SNAPSHOTS).
+    """
+    if not SNAPSHOT_KEY and not TRUST_UNSIGNED_SNAPSHOTS:
+        return None
+    try:
+        with open(snapshot_path, 'rb') as f:
+            header = read_header(f)
+            if not is_fresh(header, json_file_path):
+                return None
+            payload = f.read()
+            payload_sha256 = header["payload_sha256"]
+    except (OSError, ValueError, struct.error, KeyError, TypeError, AttributeError):
+        # A truncated or malformed header is treated like a stale snapshot
+        return None
+    if hashlib.sha256(payload).hexdigest() != payload_sha256:
+        logger.warning("Ignoring corrupt registry snapshot %s", snapshot_path)
+        return None
+    if SNAPSHOT_KEY and not hmac.compare_digest(str(header.get("payload_hmac")).encode('utf-8'), payload_hmac(payload).encode('utf-8')):
+        logger.warning("Ignoring registry snapshot %s without a valid signature", snapshot_path)
+        return None
+    # Unpickling allocates many small containers and no garbage; pausing the cyclic
+    # garbage collector avoids repeated collections during the load
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        registry = pickle.loads(payload)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    registry.source = json_file_path
+    # A touched but unchanged data file is still newer than the one the snapshot was built from
+    registry.generation = os.stat(json_file_path).st_mtime_ns
+    return registry
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        for data_file in sys.argv[2:] or [DEFAULT_DATA_FILE]:
+            print(f"Wrote {build_snapshot(data_file)}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "info":
+        with open(sys.argv[2], 'rb') as f:
+            print(json.dumps(read_header(f), indent=2))
+    else:
+        print("Usage: python registry_snapshot.py build [data_file ...] | info <snapshot_file>")
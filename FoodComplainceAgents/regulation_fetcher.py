@@ -0,0 +1,210 @@
+"""
+Online regulation lookups for ingredients that are missing from the local data file.
+
+A RegulationFetcher backend answers "what is the maximum level of X in Y?". The
+RegulationLookup in front of it adds:
+- a persistent cache of fetched limits with provenance and expiry,
+- negative caching of misses,
+- deduplication of concurrent identical lookups,
+- retries with exponential backoff, bounded by an overall deadline.
+"""
+import asyncio
+import os
+import random
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from llm_cache import SQLiteStore, normalize_input
+
+logger = logging.getLogger(__name__)
+
+# REGULATION_CACHE_FILE moves the persistent cache of online lookups, e.g. to a shared volume
+REGULATION_CACHE_FILE = os.environ.get("REGULATION_CACHE_FILE",
+                                       os.path.join(os.path.expanduser("~"), ".cache", "food_compliance", "regulation_cache.sqlite"))
+
+MAX_LEVEL_PATTERN = re.compile(r'(\d+\.?\d*)\s*(mg/kg|mg/l)', re.IGNORECASE)
+
+class RegulationFetchError(Exception):
+    """Raised when a backend keeps failing until the retries or the deadline are exhausted."""
+
+class RegulationFetcher:
+    """Interface of regulation backends. `fetch` returns {"max_level", "source"} or None if nothing was found."""
+
+    name = "base"
+
+    async def fetch(self, ingredient, food_product):
+        raise NotImplementedError
+
+class GoogleSearchFetcher(RegulationFetcher):
+    """Looks the limit up with google_web_search and takes the first mg/kg or mg/L figure of the answer."""
+
+    name = "google_web_search"
+
+    def __init__(self, search=None):
+        self._search = search
+
+    def search(self, query):
+        if self._search is None:
+            # Only available inside the agent runtime, so it is imported on first use
+            from default_api import google_web_search
+            self._search = google_web_search
+        return self._search(query=query)
+
+    async def fetch(self, ingredient, food_product):
+        query = f"EU regulation for {ingredient} in {food_product}"
+        search_results = await asyncio.to_thread(self.search, query)
+        output = (search_results or {}).get("google_web_search_response", {}).get("output")
+        if not output:
+            return None
+        # Naive parsing of search results. This should be improved with more sophisticated NLP techniques.
+        max_level_match = MAX_LEVEL_PATTERN.search(output)
+        if not max_level_match:
+            return None
+        unit = "mg/L" if max_level_match.group(2).lower() == "mg/l" else "mg/kg"
+        return {"max_level": f"{max_level_match.group(1)} {unit}", "source": f"Online search: '{query}'"}
+
+class StubFetcher(RegulationFetcher):
+    """
+    Local backend for tests and offline use (orchestrator.py --offline-limits). `limits` maps an ingredient, or an
+    (ingredient, food_product) pair, to a max_level string. It can simulate latency
+    and a number of initial failures, and counts the calls it receives.
+    """
+
+    name = "stub"
+
+    def __init__(self, limits=None, latency=0.0, failures=0):
+        self.limits = {self._key(key): value for key, value in (limits or {}).items()}
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+
+    @staticmethod
+    def _key(key):
+        if isinstance(key, tuple):
+            return tuple(normalize_input(part) for part in key)
+        return normalize_input(key)
+
+    async def fetch(self, ingredient, food_product):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Simulated regulation backend failure")
+        max_level = self.limits.get(self._key((ingredient, food_product)), self.limits.get(self._key(ingredient)))
+        if max_level is None:
+            return None
+        return {"max_level": max_level, "source": "Stub regulation backend"}
+
+class RegulationLookup:
+    """Caching, deduplicating and retrying front end for a RegulationFetcher."""
+
+    def __init__(self, fetcher, store=None, ttl=30 * 24 * 3600, negative_ttl=24 * 3600,
+                 max_attempts=3, base_delay=0.5, deadline=10.0):
+        self.fetcher = fetcher
+        self.store = store if store is not None else SQLiteStore(":memory:")
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.deadline = deadline
+        self._in_flight = {}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(ingredient, food_product):
+        return f"regulation:{normalize_input(ingredient)}|{normalize_input(food_product)}"
+
+    def cached_entry(self, ingredient, food_product):
+        """Returns the cached entry ({"regulation", "provenance"}) or None if the lookup is not cached."""
+        return self.store.get(self.cache_key(ingredient, food_product))
+
+    async def lookup(self, ingredient, food_product):
+        """Returns {"max_level", "source"} for the ingredient, or None if no regulation was found."""
+        key = self.cache_key(ingredient, food_product)
+        entry = self.store.get(key)
+        if entry is not None:
+            return entry["regulation"]
+
+        # Concurrent identical lookups share one fetch
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = asyncio.ensure_future(self._fetch_and_cache(key, ingredient, food_product))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(in_flight)
+
+    async def _fetch_and_cache(self, key, ingredient, food_product):
+        try:
+            regulation = await self._fetch_with_backoff(ingredient, food_product)
+        except Exception as e:
+            # Failures are not cached, so the next lookup tries again
+            logger.warning("Regulation lookup for '%s' in '%s' failed: %s", ingredient, food_product, e)
+            return None
+
+        fetched_at = time.time()
+        expires_at = fetched_at + (self.ttl if regulation is not None else self.negative_ttl)
+        self.store.set(key, {
+            "regulation": regulation,
+            "provenance": {
+                "backend": self.fetcher.name,
+                "ingredient": ingredient,
+                "food_product": food_product,
+                "fetched_at": datetime.fromtimestamp(fetched_at, timezone.utc).isoformat(),
+                "expires_at": datetime.fromtimestamp(expires_at, timezone.utc).isoformat()
+            }
+        }, expires_at)
+        return regulation
+
+    async def _fetch_with_backoff(self, ingredient, food_product):
+        give_up_at = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(self.max_attempts):
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return await asyncio.wait_for(self.fetcher.fetch(ingredient, food_product), remaining)
+            except Exception as e:
+                last_error = e
+                if attempt + 1 < self.max_attempts:
+                    delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.0)
+                    await asyncio.sleep(min(delay, max(give_up_at - time.monotonic(), 0)))
+        raise RegulationFetchError(f"gave up after {self.max_attempts} attempts or {self.deadline}s: {last_error!r}")
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="regulation-lookup", daemon=True).start()
+            return self._loop
+
+    def lookup_sync(self, ingredient, food_product):
+        """
+        Blocking lookup for synchronous callers. All callers share one background event
+        loop, so identical lookups from different threads are also deduplicated.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.lookup(ingredient, food_product), self._get_loop())
+        return future.result()
+
+_default_lookup = None
+_default_lookup_lock = threading.Lock()
+
+def get_regulation_lookup():
+    """Returns the process-wide lookup: google_web_search backed by the persistent cache file, unless replaced."""
+    global _default_lookup
+    with _default_lookup_lock:
+        if _default_lookup is None:
+            os.makedirs(os.path.dirname(os.path.abspath(REGULATION_CACHE_FILE)), exist_ok=True)
+            _default_lookup = RegulationLookup(GoogleSearchFetcher(), SQLiteStore(REGULATION_CACHE_FILE))
+        return _default_lookup
+
+def set_regulation_lookup(lookup):
+    """Replaces the process-wide lookup, e.g. with one backed by a StubFetcher for offline runs."""
+    global _default_lookup
+    with _default_lookup_lock:
+        _default_lookup = lookup
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+
+from compliance_rules import convert_to_mg_per_kg_or_l, canonical_unit
+from telemetry import metrics
+
+metrics.describe("verdict_cache_lookups_total", "Verdict cache lookups by result.")
+
+REASON_PREFIX = "Requested concentration "
+
+def canonical_concentration(concentration):
+    """Returns (value, unit) in mg/kg or mg/L for a '<value> <unit>' concentration, or None if it cannot be converted."""
+    try:
+        value_str, unit = concentration.split()
+        value = convert_to_mg_per_kg_or_l(float(value_str), unit)
+    except (AttributeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return round(value, 9), canonical_unit(unit)
+
+class VerdictCache:
+    """
+    Bounded LRU of complete verdicts (evaluation, judgment and explanation) keyed on the
+    additive code, the resolved food category ID and the concentration in canonical units.
+
+    Entries belong to one registry, identified by its generation and version. When another
+    registry is seen, including an older one after the data file was rolled back, the
+    in-memory entries are evicted and the cache follows that registry. Only store rows of
+    older generations are deleted, so workers still serving a newer registry keep theirs.
+    Verdicts quote the requested concentration, so a hit is returned with the
+    concentration as written in the new request, e.g. "0.15 g/L" instead of "150 mg/L".
+
+    When a `store` (e.g. a SQLiteStore shared by all server workers) is given, verdicts are
+    written through to it and read back on in-memory misses, so a verdict computed by one
+    worker is a hit in the others.
+    """
+
+    def __init__(self, maxsize=4096, store=None):
+        self.maxsize = maxsize
+        self.store = store
+        self.generation = None
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(registry, ingredient, category_id, concentration):
+        """Returns the cache key of an evaluation, or None if the evaluation cannot be cached."""
+        if registry is None or registry.version is None or category_id is None:
+            return None
+        additive = registry.get_by_code(ingredient) or registry.get_by_alias(ingredient)
+        # Without rules for the resolved category the evaluator matches the food product
+        # name instead, so the verdict would not be determined by the key alone
+        if not additive or not additive.get("code") or not registry.rules_for_category(additive, category_id):
+            return None
+        canonical = canonical_concentration(concentration)
+        if canonical is None:
+            return None
+        return registry.generation, registry.version, additive["code"], category_id, canonical
+
+    @staticmethod
+    def store_key(key):
+        # Zero-padded, so store keys of older generations sort before newer ones
+        generation, *parts = key
+        return ":".join([f"{generation:020d}"] + [str(part) for part in parts])
+
+    def _check_registry(self, key):
+        # Keys start with the registry generation and version; any other registry evicts the entries
+        generation, version = key[0], key[1]
+        if (generation, version) != (self.generation, self.version):
+            self._entries.clear()
+            self.generation, self.version = generation, version
+            if self.store:
+                self.store.delete_before(f"{generation:020d}:")
+
+    def get(self, key, concentration):
+        """Returns a copy of the cached verdict for `key`, worded for `concentration`, or None."""
+        with self._lock:
+            self._check_registry(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc("verdict_cache_lookups_total", result="hit")
+
+        if entry is None:
+            stored = self.store.get(self.store_key(key)) if self.store else None
+            with self._lock:
+                if stored is None:
+                    self.misses += 1
+                    metrics.inc("verdict_cache_lookups_total", result="miss")
+                    return None
+                self.hits += 1
+                metrics.inc("verdict_cache_lookups_total", result="store_hit")
+                entry = (stored["concentration"], stored["verdict"])
+                self._remember(key, entry)
+        cached_concentration, verdict = entry
+        if cached_concentration == concentration:
+            return dict(verdict)
+        old, new = REASON_PREFIX + cached_concentration + " ", REASON_PREFIX + concentration + " "
+        return {field: value.replace(old, new) if isinstance(value, str) else value for field, value in verdict.items()}
+
+    def set(self, key, concentration, verdict):
+        with self._lock:
+            self._check_registry(key)
+            self._remember(key, (concentration, dict(verdict)))
+        if self.store:
+            self.store.set(self.store_key(key), {"concentration": concentration, "verdict": verdict})
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.store:
+            self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "registry_version": self.version,
+                "registry_generation": self.generation
+            }
@@ -0,0 +1,29 @@
+"""
+gunicorn settings for serving the compliance server with several worker processes:
+
+    gunicorn -c gunicorn.conf.py server:app
+
+The master imports the app and loads the additive registry once; the workers are forked from
+it and share the registry, its indices and the pre-classifier copy-on-write. The LLM and
+verdict caches are written through to one SQLite file, so an answer computed by one worker
+is a cache hit in all others.
+"""
+import os
+
+os.environ.setdefault("PRELOAD_REGISTRY", "1")
+os.environ.setdefault("SHARED_CACHE_FILE",
+                      os.path.join(os.path.expanduser("~"), ".cache", "food_compliance", "compliance_cache.sqlite"))
+os.makedirs(os.path.dirname(os.path.abspath(os.environ["SHARED_CACHE_FILE"])), exist_ok=True)
+
+bind = os.environ.get("BIND", "0.0.0.0:8080")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# Every worker runs several requests at a time, as with `python server.py`
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 8))
+preload_app = os.environ["PRELOAD_REGISTRY"] == "1"
+# The streaming endpoint keeps a request open while a label is evaluated
+timeout = 120
+
+def post_fork(arbiter, worker):
+    import server as app_module
+    app_module.start_worker()
@@ -1,43 +1,283 @@
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
-import subprocess
-import json
-import sys
-
-app = Flask(__name__, static_url_path='', static_folder='public')
-CORS(app)
-
-@app.route('/')
-def index():
-    return send_from_directory('public', 'index.html')
-
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    print("--- Received a request on /analyze ---", file=sys.stderr)
-    data = request.get_json()
-    print("Request data:", data, file=sys.stderr)
-    
-    text_block = data.get('text_block')
-    
-    if not text_block:
-        return jsonify({"error": "Missing text_block"}), 400
-        
-    try:
-        command = ["python3", "/home/student_01_ab8595ac0887/hackathon_project/main.py", text_block]
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        
-        if process.returncode != 0:
-            print(f"Error executing main.py: {stderr.decode('utf-8')}", file=sys.stderr)
-            return jsonify({"error": f"Error executing main.py: {stderr.decode('utf-8')}"}), 500
-            
-        results = json.loads(stdout.decode('utf-8'))
-        print("Returning results:", results, file=sys.stderr)
-        return jsonify(results)
-        
-    except Exception as e:
-        print(f"An unexpected error occurred: {str(e)}", file=sys.stderr)
-        return jsonify({"error": str(e)}), 500
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080)
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
+from flask_cors import CORS
+import threading
+import gc
+import hmac
+import json
+import logging
+import os
+import sys
+import time
+
+AGENTS_DIR = "/home/student_01_ab8595ac0887/hackathon_project"
+sys.path.insert(0, AGENTS_DIR)
+
+from pipeline import create_pipeline
+from additive_registry import get_registry_holder
+from llm_cache import LLMCache, SQLiteStore
+from llm_client import AsyncLLMClient, HTTPModelBackend
+from verdict_cache import VerdictCache
+from headroom import sweep, recipe_headroom
+from permitted_additives import permitted_additives
+from preclassifier import get_preclassifier
+from telemetry import metrics, start_trace
+
+# Requests analysed at the same time; further requests are rejected with 429
+MAX_CONCURRENT_REQUESTS = 8
+# Ingredients processed at the same time across all requests
+INGREDIENT_WORKERS = 8
+# Seconds an ingredient may run before it is reported as timed out
+INGREDIENT_TIMEOUT = 60
+# Seconds between checks of the additive data file for changes
+DATA_FILE_POLL_INTERVAL = 5
+# When set, POST /admin/reload requires this value in the X-Admin-Token header
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Without ADMIN_TOKEN, /admin/reload only answers clients on this host
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+# Set by gunicorn.conf.py: the registry is loaded before the workers are forked and shared by them
+PRELOAD_REGISTRY = os.environ.get("PRELOAD_REGISTRY") == "1"
+# When set, the LLM and verdict caches are written through to this SQLite file, shared by all workers
+SHARED_CACHE_FILE = os.environ.get("SHARED_CACHE_FILE")
+# When set, LLM helper calls go to this model server, coalesced and batched across requests
+MODEL_SERVER_URL = os.environ.get("MODEL_SERVER_URL")
+# Model calls per second allowed by the model server, unlimited when unset
+MODEL_RATE_LIMIT = float(os.environ["MODEL_RATE_LIMIT"]) if os.environ.get("MODEL_RATE_LIMIT") else None
+
+logger = logging.getLogger("food_compliance.server")
+
+metrics.describe("http_requests_total", "HTTP requests by endpoint and status code.")
+metrics.describe("http_request_duration_seconds", "Time to answer an HTTP request, until the end of the stream for streaming endpoints.")
+
+app = Flask(__name__, static_url_path='', static_folder='public')
+CORS(app)
+
+llm_cache = LLMCache(maxsize=10000, store=SQLiteStore(SHARED_CACHE_FILE) if SHARED_CACHE_FILE else None)
+# Verdicts are shared by all requests and dropped when the additive data changes
+verdict_cache = VerdictCache(maxsize=20000, store=SQLiteStore(SHARED_CACHE_FILE, table="verdicts") if SHARED_CACHE_FILE else None)
+llm_client = AsyncLLMClient(HTTPModelBackend(MODEL_SERVER_URL), rate_limit=MODEL_RATE_LIMIT) if MODEL_SERVER_URL else None
+pipeline = create_pipeline(max_workers=INGREDIENT_WORKERS, timeout=INGREDIENT_TIMEOUT, llm_cache=llm_cache, verdict_cache=verdict_cache,
+                           llm_client=llm_client)
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+registry_holder = get_registry_holder()
+# Set by the holder as soon as any load succeeds, also when the watcher recovers from a failed startup load
+registry_ready = registry_holder.ready
+startup_state = {"error": None}
+
+def load_registry():
+    """
+    Loads and indexes the additive data in the background, so the server can start immediately,
+    then watches the data file and swaps in new data when it changes.
+    """
+    try:
+        registry = registry_holder.get()
+        logger.info("Additive registry ready with %d additives.", len(registry))
+    except Exception as e:
+        startup_state["error"] = str(e)
+        logger.error("Failed to load the additive registry: %s", e)
+    registry_holder.watch(DATA_FILE_POLL_INTERVAL)
+
+def preload_registry():
+    """
+    Loads and indexes the additive data in the gunicorn master process, before the workers are
+    forked, so that all workers share one copy of it copy-on-write. The loaded objects are moved
+    out of the garbage collector's reach, as collections would otherwise touch, and so copy, their pages.
+    """
+    registry = registry_holder.get()
+    get_preclassifier(registry)
+    gc.freeze()
+    logger.info("Additive registry preloaded with %d additives.", len(registry))
+
+def start_worker():
+    """Called in every gunicorn worker after the fork: threads do not survive it, so the data file watcher is started here."""
+    registry_holder.watch(DATA_FILE_POLL_INTERVAL)
+
+def record_request(endpoint, status, started):
+    metrics.inc("http_requests_total", endpoint=endpoint, status=status)
+    metrics.observe("http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+if PRELOAD_REGISTRY:
+    preload_registry()
+else:
+    threading.Thread(target=load_registry, name="registry-loader", daemon=True).start()
+
+@app.route('/')
+def index():
+    return send_from_directory('public', 'index.html')
+
+@app.route('/healthz')
+def healthz():
+    if registry_ready.is_set():
+        registry = registry_holder.current
+        # pid tells the gunicorn workers apart
+        return jsonify({"status": "ready", "pid": os.getpid(), "additives": len(registry), "data_version": registry.version,
+                        "last_reload_error": registry_holder.last_error,
+                        "fast_path": pipeline.fast_path_stats.as_dict(), "llm_cache": llm_cache.stats(),
+                        "verdict_cache": verdict_cache.stats(), "llm_client": llm_client.stats() if llm_client else None})
+    if startup_state["error"]:
+        return jsonify({"status": "error", "error": startup_state["error"]}), 503
+    return jsonify({"status": "loading"}), 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage latencies, cache and fast-path counters and request counts in the Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    logger.debug("Received a request on /analyze")
+    data = request.get_json()
+    logger.debug("Request data: %s", data)
+
+    text_block = data.get('text_block')
+
+    if not text_block:
+        return jsonify({"error": "Missing text_block"}), 400
+
+    if not registry_ready.is_set():
+        return jsonify({"error": "The additive data is still loading. Please retry shortly."}), 503, {"Retry-After": "1"}
+
+    if not request_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many concurrent requests. Please retry shortly."}), 429, {"Retry-After": "1"}
+
+    started = time.perf_counter()
+    status = 500
+    try:
+        # The request is answered from the data in use when it starts, even if the data is reloaded meanwhile
+        registry = registry_holder.current
+        with start_trace("analyze") as trace:
+            results = pipeline.run(text_block, registry)
+        status = 200
+        logger.debug("Returning results: %s", results)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Trace: %s", json.dumps(trace.as_dict()))
+        return jsonify(results), 200, {"X-Trace-Id": trace.trace_id, "X-Data-Version": registry.version}
+
+    except Exception as e:
+        logger.exception("An unexpected error occurred: %s", e)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        request_slots.release()
+        record_request("analyze", status, started)
+
+def format_event(event, use_sse):
+    """Serializes a pipeline event as an NDJSON line or a Server-Sent Events message."""
+    payload = json.dumps(event)
+    if use_sse:
+        return f"event: {event['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """
+    Streaming variant of /analyze. Emits a "context" record with the food category, then one
+    "result" record per ingredient as soon as it is complete, and closes with a "summary" record.
+    Responds with Server-Sent Events when the client accepts text/event-stream, NDJSON otherwise.
+    """
+    data = request.get_json()
+    text_block = data.get('text_block')
+
+    if not text_block:
+        return jsonify({"error": "Missing text_block"}), 400
+
+    if not registry_ready.is_set():
+        return jsonify({"error": "The additive data is still loading. Please retry shortly."}), 503, {"Retry-After": "1"}
+
+    if not request_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many concurrent requests. Please retry shortly."}), 429, {"Retry-After": "1"}
+
+    use_sse = request.accept_mimetypes.best == 'text/event-stream'
+    started = time.perf_counter()
+    registry = registry_holder.current
+
+    def generate():
+        try:
+            for event in pipeline.iter_run(text_block, registry):
+                yield format_event(event, use_sse)
+        except Exception as e:
+            logger.exception("An unexpected error occurred while streaming: %s", e)
+            yield format_event({"type": "error", "error": str(e)}, use_sse)
+
+    def close():
+        request_slots.release()
+        record_request("analyze_stream", 200, started)
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Data-Version": registry.version})
+    # Release the slot when the response is closed, even if the client disconnects before the stream starts
+    response.call_on_close(close)
+    return response
+
+@app.route('/headroom', methods=['POST'])
+def headroom():
+    """
+    Evaluates many concentrations in one call. Send either
+    {"ingredient", "food_category", "unit", "concentrations": [...]} (or "start", "stop", "num")
+    for one additive, or {"recipe": [{"name", "concentration"}], "food_category", "scales": [...]}
+    (or "start", "stop", "num") to scale a whole recipe.
+    """
+    data = request.get_json() or {}
+    food_category = data.get('food_category')
+    if not food_category or not (data.get('ingredient') or data.get('recipe')):
+        return jsonify({"error": "Missing food_category and ingredient or recipe"}), 400
+
+    if not registry_ready.is_set():
+        return jsonify({"error": "The additive data is still loading. Please retry shortly."}), 503, {"Retry-After": "1"}
+
+    if not request_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many concurrent requests. Please retry shortly."}), 429, {"Retry-After": "1"}
+
+    started = time.perf_counter()
+    status = 500
+    try:
+        registry = registry_holder.current
+        range_options = {key: data[key] for key in ("start", "stop", "num") if key in data}
+        if data.get('recipe'):
+            result = recipe_headroom(data['recipe'], food_category, data.get('scales'), registry=registry, **range_options)
+        else:
+            result = sweep(data['ingredient'], food_category, data.get('concentrations'), data.get('unit', 'mg/kg'), registry=registry, **range_options)
+        status = 422 if "error" in result else 200
+        return jsonify(result), status, {"X-Data-Version": registry.version}
+    finally:
+        request_slots.release()
+        record_request("headroom", status, started)
+
+@app.route('/categories/<path:food_category>/additives')
+def category_additives(food_category):
+    """
+    Lists the additives permitted in a food category, given as a category_id such as 14.1.4
+    or a food product name. Query parameters: function=Preservative filters by function,
+    include_subcategories=1 adds the additives permitted in its subcategories.
+    """
+    if not registry_ready.is_set():
+        return jsonify({"error": "The additive data is still loading. Please retry shortly."}), 503, {"Retry-After": "1"}
+
+    registry = registry_holder.current
+    result = permitted_additives(food_category, request.args.get('function'),
+                                 request.args.get('include_subcategories') in ("1", "true"), registry=registry)
+    status = 404 if "error" in result else 200
+    return jsonify(result), status, {"X-Data-Version": registry.version}
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Reloads the additive data file now instead of waiting for the watcher. The new data is
+    validated first; if it is invalid, the current data stays in use and 422 is returned.
+    Pass ?force=1 to rebuild the registry even if the file did not change.
+    Requires the X-Admin-Token header when ADMIN_TOKEN is set, and a local client otherwise.
+    """
+    if ADMIN_TOKEN:
+        token = request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+            return jsonify({"error": "Invalid admin token"}), 403
+    elif request.remote_addr not in LOOPBACK_ADDRESSES:
+        return jsonify({"error": "Set ADMIN_TOKEN to reload the data from other hosts"}), 403
+
+    result = registry_holder.reload(force=request.args.get("force") in ("1", "true"))
+    if "error" in result:
+        return jsonify(result), 422
+    return jsonify(result)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    app.run(host='0.0.0.0', port=8080, threaded=True)